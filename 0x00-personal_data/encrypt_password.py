@@ -5,19 +5,82 @@
 encrypt_password  module
 """
 
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache, partial
+from typing import Iterable, List, Optional, Tuple
+import asyncio
 import bcrypt
+import os
+import time
 
+DEFAULT_COST = 12
+MIN_COST = 10
+MAX_COST = 16
 
-def hash_password(password: str) -> bytes:
+
+@lru_cache(maxsize=None)
+def calibrate_cost(target_ms: float, min_cost: int = MIN_COST,
+                   max_cost: int = MAX_COST) -> int:
+    """
+    Arguments:
+        target_ms(:object:`float`): Latency budget of one hash, in ms
+        min_cost(:object:`int`): Lowest cost returned, even over budget
+        max_cost(:object:`int`): Highest cost returned
+
+    Return:
+        Returns the largest bcrypt cost whose hash time on this host stays
+        under target_ms. Each extra cost unit doubles the hash time, so one
+        hash at min_cost is measured and extrapolated. Cached per arguments
+    """
+    salt = bcrypt.gensalt(min_cost)
+    start = time.perf_counter()
+    bcrypt.hashpw(b'calibration', salt)
+    elapsed_ms = (time.perf_counter() - start) * 1000
+
+    cost = min_cost
+    while cost < max_cost and elapsed_ms * 2 <= target_ms:
+        cost += 1
+        elapsed_ms *= 2
+    return cost
+
+
+def get_cost() -> int:
+    """
+    Return:
+        Returns the bcrypt cost used by hash_password: calibrated against
+        the BCRYPT_TARGET_MS environment variable when it is set, else
+        DEFAULT_COST
+    """
+    target_ms = os.getenv('BCRYPT_TARGET_MS')
+    if not target_ms:
+        return DEFAULT_COST
+    return calibrate_cost(float(target_ms))
+
+
+def hash_cost(hashed_password: bytes) -> int:
+    """
+    Arguments:
+        hashed_password(:object:`bytes`): Hashed password
+
+    Return:
+        Returns the bcrypt cost the password was hashed with
+    """
+    return int(hashed_password.split(b'$')[2])
+
+
+def hash_password(password: str, cost: Optional[int] = None) -> bytes:
     """
     Arguments:
         password(:object:`str`): Password to be hashed
+        cost(:object:`int`): bcrypt cost (default: get_cost())
 
     Return:
         Returns hashed password
     """
     byte_pw = bytes(password, 'utf-8')
-    hashee = bcrypt.hashpw(byte_pw, bcrypt.gensalt())
+    if cost is None:
+        cost = get_cost()
+    hashee = bcrypt.hashpw(byte_pw, bcrypt.gensalt(cost))
     return hashee
 
 
@@ -32,3 +95,92 @@ def is_valid(hashed_password: bytes, password: str) -> bool:
     """
     byte_pw = bytes(password, 'utf-8')
     return bcrypt.checkpw(byte_pw, hashed_password)
+
+
+def needs_rehash(hashed_password: bytes) -> bool:
+    """
+    Arguments:
+        hashed_password(:object:`bytes`): Hashed password
+
+    Return:
+        Return true if the hash uses a lower cost than get_cost, so it
+        should be replaced on the next successful login
+    """
+    return hash_cost(hashed_password) < get_cost()
+
+
+def check_password(hashed_password: bytes, password: str) -> Tuple[bool, bool]:
+    """
+    Arguments:
+        hashed_password(:object:`bytes`): Hashed password
+        password(:object:`str`): Password whose validity is to be checked
+
+    Return:
+        Returns (is_valid, needs_rehash): whether the password matches, and
+        whether it matched a hash with a stale cost
+    """
+    valid = is_valid(hashed_password, password)
+    return valid, valid and needs_rehash(hashed_password)
+
+
+def _is_valid_pair(pair: Tuple[bytes, str]) -> bool:
+    """
+    Unpacks a (hashed_password, password) pair for is_valid
+    """
+    return is_valid(*pair)
+
+
+def hash_passwords(passwords: Iterable[str],
+                   workers: Optional[int] = None) -> List[bytes]:
+    """
+    Arguments:
+        passwords(:object:`iterable`): Passwords to be hashed
+        workers(:object:`int`): Number of worker processes (default: one
+        per CPU)
+
+    Return:
+        Returns the hashed passwords, in input order, hashed in parallel
+        by a process pool. The cost is resolved once, here, so workers do
+        not each calibrate it and every hash matches needs_rehash
+    """
+    hash_with_cost = partial(hash_password, cost=get_cost())
+    with ProcessPoolExecutor(workers) as executor:
+        return list(executor.map(hash_with_cost, passwords))
+
+
+def verify_many(pairs: Iterable[Tuple[bytes, str]],
+                workers: Optional[int] = None) -> List[bool]:
+    """
+    Arguments:
+        pairs(:object:`iterable`): (hashed_password, password) pairs
+        workers(:object:`int`): Number of worker processes (default: one
+        per CPU)
+
+    Return:
+        Returns is_valid for each pair, in input order, checked in parallel
+        by a process pool
+    """
+    with ProcessPoolExecutor(workers) as executor:
+        return list(executor.map(_is_valid_pair, pairs))
+
+
+async def hash_passwords_async(passwords: Iterable[str],
+                               workers: Optional[int] = None) -> List[bytes]:
+    """
+    Awaitable hash_passwords that keeps the event loop free while the
+    process pool works
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(None, hash_passwords, list(passwords),
+                                      workers)
+
+
+async def verify_many_async(pairs: Iterable[Tuple[bytes, str]],
+                            workers: Optional[int] = None) -> List[bool]:
+    """
+    Awaitable verify_many that keeps the event loop free while the
+    process pool works
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(None, verify_many, list(pairs),
+                                      workers)
@@ -5,13 +5,28 @@
 filtered_logger  module
 """
 
-from typing import List, Sequence, Union, Tuple
+from typing import (List, Sequence, Union, Tuple, Pattern, Mapping,
+                    Iterator, Optional, Iterable, TextIO, Callable)
+from concurrent.futures import ProcessPoolExecutor
+from collections import deque
+from contextlib import contextmanager
+from functools import lru_cache
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+import copy
 import re
 import logging
 import mysql.connector
 import os
+import queue
+import sys
+import threading
+import time
 
 PII_FIELDS = ('email', 'phone', 'ssn', 'password', 'name')
+LOGGER_HANDLERS = ('stream', 'file', 'queue')
+_logger_config = None
+_db_pool = None
+_db_pool_lock = threading.Lock()
 
 
 def filter_datum(fields: List[str], redaction: str, message: str,
@@ -35,11 +50,62 @@ def filter_datum(fields: List[str], redaction: str, message: str,
     Return:
         (:object: `str`): The log message obfuscated
     """
-    rpl = '{0}={1}{2}'
-    for fld in fields:
-        message = re.sub("{0}=.*?{1}".format(fld, separator),
-                         rpl.format(fld, redaction, separator), message)
-    return message
+    if not fields:
+        return message
+    pattern = compile_redaction(tuple(fields), separator)
+    return pattern.sub(redaction_template(redaction, separator), message)
+
+
+@lru_cache(maxsize=None)
+def compile_redaction(fields: Tuple[str, ...], separator: str) -> Pattern:
+    """
+    Compiles a single alternation regex matching the value of every field
+    in fields, so a log line is redacted in one pass. Results are cached by
+    the (fields, separator) tuple.
+
+    Arguments:
+        fields(:object:`tuple`): Tuple of strings representing
+        all fields to obfuscate
+
+        separator(:object:`str`): a string representing by which character is
+        separating all fields in the log line (message)
+
+    Return:
+        (:object: `re.Pattern`): The compiled redaction pattern
+    """
+    alternation = '|'.join('(?:{})'.format(fld) for fld in fields)
+    return re.compile("(?P<field>{0})=.*?{1}".format(alternation, separator))
+
+
+def redaction_template(redaction: str, separator: str) -> str:
+    """
+    Returns the replacement template used with a pattern built by
+    compile_redaction
+    """
+    return '\\g<field>={0}{1}'.format(redaction, separator)
+
+
+class RowFormat(str):
+    """
+    Log format built by row_format. Only records using one are redacted by
+    key by RedactingFormatter; any other message is scanned with the regex
+    """
+
+
+def row_format(heading: Sequence[str]) -> str:
+    """
+    Returns a %-style log format rendering a row mapping as
+    "key=value; key=value;". Logging it with the row dict as argument lets
+    RedactingFormatter mask values by key instead of scanning the line.
+
+    Arguments:
+        heading(:object:`list`): Column names of the row
+
+    Return:
+        (:object: `str`): The log format for rows with these columns
+    """
+    return RowFormat('; '.join('{0}=%({1})s'.format(
+        str(key).replace('%', '%%'), key) for key in heading) + ';')
 
 
 class RedactingFormatter(logging.Formatter):
@@ -58,6 +124,11 @@ class RedactingFormatter(logging.Formatter):
 
         SEPARATOR(:object:`str`): a string representing by which character is
         separating all fields in the log line (message)
+
+    Records logged with a row_format message and a mapping as args (e.g.
+    logger.info(row_format(heading), row)) are redacted by key before the
+    message is rendered, skipping the regex scan of the formatted line.
+    Every other record, mapping args included, is scanned.
         """
 
     REDACTION = "***"
@@ -66,30 +137,160 @@ class RedactingFormatter(logging.Formatter):
 
     def __init__(self, fields: List[str]):
         self.flds = fields
+        self._pattern = None
+        if fields:
+            self._pattern = compile_redaction(tuple(fields), self.SEPARATOR)
+        self._template = redaction_template(self.REDACTION, self.SEPARATOR)
         super(RedactingFormatter, self).__init__(self.FORMAT)
 
     def format(self, record: logging.LogRecord) -> str:
         """Method to filter values in incoming log records using filter_datu"""
-        msg = record.getMessage()
+        if isinstance(record.msg, RowFormat) and \
+                isinstance(record.args, Mapping):
+            return self.format_structured(record)
         # record.__dict__['msg'] = new_msg
         new_msg = super(RedactingFormatter, self).format(record)
-        return filter_datum(self.flds, self.REDACTION, new_msg, self.SEPARATOR)
+        if self._pattern is None:
+            return new_msg
+        return self._pattern.sub(self._template, new_msg)
+
+    def format_structured(self, record: logging.LogRecord) -> str:
+        """Method to mask the values of a record's mapping args by key and
+        render the record once"""
+        args = record.args
+        masked = dict(args)
+        for fld in self.flds:
+            if fld in masked:
+                masked[fld] = self.REDACTION
+        record.args = masked
+        try:
+            return super(RedactingFormatter, self).format(record)
+        finally:
+            record.args = args
+
+
+class BlockingQueueListener(QueueListener):
+    """
+    QueueListener whose stop() waits for room in a bounded queue to put its
+    sentinel, instead of failing when the queue is full
+    """
+
+    def enqueue_sentinel(self) -> None:
+        """Method that puts the stop sentinel after the pending records"""
+        self.queue.put(self._sentinel)
 
 
-def get_logger() -> logging.Logger:
+class AsyncQueueHandler(QueueHandler):
     """
-    A function that takes no arguments and returns a logging.Logger object.
-    logger is named "user_data" at a "logging.INFO" level
+    Queue handler that only enqueues records; formatting, redaction and I/O
+    happen on the thread of a QueueListener feeding the given handlers
+
+    Arguments:
+        handlers(:object:`list`): Handlers the listener thread dispatches to
+
+        queue_size(:object:`int`): Maximum number of pending records
+
+        block(:object:`bool`): When the queue is full, wait for room if True,
+        otherwise drop the record and count it in `dropped`
     """
 
+    def __init__(self, handlers: Sequence[logging.Handler],
+                 queue_size: int = 10000, block: bool = False):
+        super(AsyncQueueHandler, self).__init__(queue.Queue(queue_size))
+        self.block = block
+        self.dropped = 0
+        self.listener = BlockingQueueListener(self.queue, *handlers,
+                                              respect_handler_level=True)
+        self.listener.start()
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        """Method that hands a shallow copy of the record to the listener
+        without formatting it on the caller's thread"""
+        return copy.copy(record)
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        """Method that enqueues a record following the drop-or-block
+        policy"""
+        try:
+            self.queue.put(record, block=self.block)
+        except queue.Full:
+            self.dropped += 1
+
+    def close(self) -> None:
+        """Method that flushes pending records, stops the listener and
+        closes its handlers. It is called by logging.shutdown at exit"""
+        self.acquire()
+        try:
+            listener, self.listener = self.listener, None
+        finally:
+            self.release()
+        if listener is not None:
+            listener.stop()
+            for handl in listener.handlers:
+                handl.close()
+        super(AsyncQueueHandler, self).close()
+
+
+def get_logger(handler: str = 'stream', filename: Optional[str] = None,
+               max_bytes: int = 0, backup_count: int = 0,
+               queue_size: int = 10000,
+               block: bool = False) -> logging.Logger:
+    """
+    A function that returns the logging.Logger object named "user_data", at
+    a "logging.INFO" level, with the handler its arguments describe
+
+    The logger is configured once: calling again with the same options
+    returns it untouched, while different options replace its handlers.
+
+    Arguments:
+        handler(:object:`str`): One of LOGGER_HANDLERS. "stream" writes to
+        stderr, "file" to a RotatingFileHandler on filename, and "queue"
+        puts records on an AsyncQueueHandler whose listener writes to
+        filename if given, else to stderr
+
+        filename(:object:`str`): Log file of the "file" and "queue"
+        handlers; the "stream" handler takes none
+
+        max_bytes, backup_count(:object:`int`): Rotation settings of the
+        file handler
+
+        queue_size, block(:object:`int`, :object:`bool`): Queue bound and
+        full-queue policy of the queue handler
+    """
+    global _logger_config
+
+    if handler not in LOGGER_HANDLERS:
+        raise ValueError("handler must be one of {}".format(LOGGER_HANDLERS))
+    if handler == 'file' and filename is None:
+        raise ValueError("a filename is required for the file handler")
+    if handler == 'stream' and filename is not None:
+        raise ValueError("the stream handler writes to stderr, use the file "
+                         "handler for a filename")
+
     logger = logging.getLogger("user_data")
+    config = (handler, filename, max_bytes, backup_count, queue_size, block)
+    if _logger_config == config and logger.handlers:
+        return logger
+
+    for old_handl in list(logger.handlers):
+        logger.removeHandler(old_handl)
+        old_handl.close()
+
     logger.setLevel(logging.INFO)
-    stream_handl = logging.StreamHandler()
+    if filename is not None:
+        out_handl = RotatingFileHandler(filename, maxBytes=max_bytes,
+                                        backupCount=backup_count)
+    else:
+        out_handl = logging.StreamHandler()
     r_formatter = RedactingFormatter(PII_FIELDS)
 
-    stream_handl.setFormatter(r_formatter)
+    out_handl.setFormatter(r_formatter)
     logger.propagate = False
-    logger.addHandler(stream_handl)
+    if handler == 'queue':
+        logger.addHandler(AsyncQueueHandler([out_handl], queue_size, block))
+    else:
+        logger.addHandler(out_handl)
+    _logger_config = config
     return logger
 
 
@@ -108,24 +309,341 @@ def get_db() -> mysql.connector.connection.MySQLConnection:
     return conn
 
 
-def main() -> None:
+class ConnectionPool:
+    """
+    Small pool of database connections
+
+    Arguments:
+        connect(:object:`callable`): Function opening a new connection
+
+        size(:object:`int`): Maximum number of open connections
+
+        recycle(:object:`float`): Seconds after which a connection is closed
+        and replaced on checkout, 0 to keep connections forever
+
+        timeout(:object:`float`): Seconds to wait for a free connection when
+        all are checked out, None to wait forever
+    """
+
+    def __init__(self, connect: Callable, size: int = 5,
+                 recycle: float = 3600, timeout: Optional[float] = None):
+        self.connect = connect
+        self.size = size
+        self.recycle = recycle
+        self.timeout = timeout
+        self._idle = []
+        self._opened = 0
+        self._created = {}
+        self._closed = False
+        self._cond = threading.Condition()
+
+    def get(self):
+        """
+        Method that checks out a connection: an idle one that is still
+        connected and younger than recycle, or a new one
+        """
+        with self._cond:
+            while not self._idle and self._opened >= self.size:
+                if not self._cond.wait(self.timeout):
+                    raise TimeoutError("no free connection in the pool")
+            conn = self._idle.pop() if self._idle else None
+            if conn is None:
+                self._opened += 1
+        if conn is not None:
+            if self._is_healthy(conn):
+                return conn
+            self._discard(conn, reopen=True)
+        try:
+            conn = self.connect()
+        except BaseException:
+            with self._cond:
+                self._opened -= 1
+                self._cond.notify()
+            raise
+        self._created[id(conn)] = time.monotonic()
+        return conn
+
+    def put(self, conn) -> None:
+        """
+        Method that returns a checked out connection to the pool, rolled
+        back so the next caller gets no open transaction or unread result.
+        It is closed instead if that fails or the pool is closed
+        """
+        try:
+            conn.rollback()
+        except Exception:
+            self._discard(conn)
+            return
+        with self._cond:
+            if not self._closed:
+                self._idle.append(conn)
+                self._cond.notify()
+                return
+        self._discard(conn)
+
+    @contextmanager
+    def connection(self):
+        """
+        Context manager checking out a connection and returning it on exit
+        """
+        conn = self.get()
+        try:
+            yield conn
+        finally:
+            self.put(conn)
+
+    def close(self) -> None:
+        """
+        Method that closes every idle connection, and the checked out ones
+        as they are returned
+        """
+        with self._cond:
+            self._closed = True
+            idle, self._idle = self._idle, []
+        for conn in idle:
+            self._discard(conn)
+
+    def _is_healthy(self, conn) -> bool:
+        """Method that checks the age and liveness of a connection"""
+        created = self._created.get(id(conn), 0)
+        if self.recycle > 0 and time.monotonic() - created > self.recycle:
+            return False
+        try:
+            return conn.is_connected()
+        except Exception:
+            return False
+
+    def _discard(self, conn, reopen: bool = False) -> None:
+        """Method that closes a connection and forgets it. With reopen, its
+        slot stays reserved for the connection replacing it"""
+        self._created.pop(id(conn), None)
+        try:
+            conn.close()
+        except Exception:
+            pass
+        if not reopen:
+            with self._cond:
+                self._opened -= 1
+                self._cond.notify()
+
+
+def get_db_pool() -> ConnectionPool:
+    """
+    Function that returns the shared pool of get_db connections. Its size
+    and recycle interval (in seconds) come from the
+    PERSONAL_DATA_DB_POOL_SIZE (default 5) and PERSONAL_DATA_DB_POOL_RECYCLE
+    (default 3600) environment variables
+    """
+    global _db_pool
+    with _db_pool_lock:
+        if _db_pool is None:
+            _db_pool = ConnectionPool(
+                get_db, int(os.getenv('PERSONAL_DATA_DB_POOL_SIZE', 5)),
+                float(os.getenv('PERSONAL_DATA_DB_POOL_RECYCLE', 3600)))
+    return _db_pool
+
+
+def iter_batches(db: mysql.connector.connection.MySQLConnection,
+                 batch_size: int = 1000,
+                 key: Optional[str] = None) -> Iterator[List[dict]]:
+    """
+    Generator that streams the users table as lists of row dicts, at most
+    batch_size rows at a time, so memory stays flat whatever the table size
+
+    Arguments:
+        db(:object:`MySQLConnection`): Connection to read from
+
+        batch_size(:object:`int`): Maximum number of rows per batch
+
+        key(:object:`str`): Optional unique, ordered column (e.g. the primary
+        key). When given, rows are paged with "WHERE key > last ORDER BY key
+        LIMIT n" queries instead of one long-running unbuffered query
+    """
+    cursor = db.cursor(buffered=False)
+    try:
+        if key is None:
+            cursor.execute("SELECT * FROM users;")
+            heading = cursor.column_names
+            while True:
+                rows = cursor.fetchmany(batch_size)
+                if not rows:
+                    return
+                yield [dict(zip(heading, row)) for row in rows]
+
+        column = "`{}`".format(key.replace("`", "``"))
+        query = "SELECT * FROM users {} ORDER BY {} LIMIT %s;"
+        cursor.execute(query.format("", column), (batch_size,))
+        while True:
+            heading = cursor.column_names
+            rows = cursor.fetchall()
+            if not rows:
+                return
+            batch = [dict(zip(heading, row)) for row in rows]
+            yield batch
+            if len(rows) < batch_size:
+                return
+            where = "WHERE {} > %s".format(column)
+            cursor.execute(query.format(where, column),
+                           (batch[-1][key], batch_size))
+    finally:
+        cursor.close()
+
+
+def report_progress(count: int, start: float, done: bool = False) -> None:
+    """
+    Writes the number of rows exported so far and the rows per second
+    to stderr
+    """
+    elapsed = time.perf_counter() - start
+    rate = count / elapsed if elapsed > 0 else 0.0
+    sys.stderr.write("{} rows {} in {:.1f}s ({:.0f} rows/s)\n".format(
+        count, "exported" if done else "so far", elapsed, rate))
+
+
+_worker_formatter = None
+
+
+def format_batch(batch: List[dict]) -> List[str]:
+    """
+    Formats and redacts a batch of row dicts into log lines. Runs in the
+    worker processes of pipeline()
+    """
+    global _worker_formatter
+    if _worker_formatter is None:
+        _worker_formatter = RedactingFormatter(PII_FIELDS)
+    if not batch:
+        return []
+    msg = row_format(tuple(batch[0]))
+    lines = []
+    for row in batch:
+        record = logging.LogRecord("user_data", logging.INFO, None, None,
+                                   msg, (row,), None)
+        lines.append(_worker_formatter.format(record))
+    return lines
+
+
+def pipeline(batches: Iterable[List[dict]], workers: Optional[int] = None,
+             stream: Optional[TextIO] = None, progress: int = 0) -> int:
+    """
+    Redacts and writes batches of rows in parallel: a reader thread pulls
+    batches from the iterable, a process pool formats them with
+    format_batch and the calling thread writes the lines in input order
+
+    Arguments:
+        batches(:object:`iterable`): Batches of row dicts, e.g. iter_batches
+
+        workers(:object:`int`): Number of worker processes (default: one
+        per CPU)
+
+        stream(:object:`TextIO`): Where lines are written (default: stderr,
+        like the StreamHandler of get_logger)
+
+        progress(:object:`int`): Report progress every n rows, 0 to disable
+
+    Return:
+        (:object: `int`): The number of rows written
+    """
+    workers = workers or os.cpu_count() or 1
+    stream = stream or sys.stderr
+    max_pending = workers * 2
+    inbox = queue.Queue(maxsize=max_pending)
+    failure = []
+    done = object()
+
+    def read():
+        try:
+            for batch in batches:
+                inbox.put(batch)
+        except BaseException as e:
+            failure.append(e)
+        finally:
+            inbox.put(done)
+
+    reader = threading.Thread(target=read, daemon=True)
+    reader.start()
+
+    count = 0
+    next_report = progress
+    start = time.perf_counter()
+    pending = deque()
+
+    def write(future):
+        nonlocal count, next_report
+        lines = future.result()
+        if lines:
+            stream.write('\n'.join(lines) + '\n')
+        count += len(lines)
+        if progress > 0 and count >= next_report:
+            report_progress(count, start)
+            next_report = count + progress
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        while True:
+            batch = inbox.get()
+            if batch is done:
+                break
+            pending.append(executor.submit(format_batch, batch))
+            if len(pending) >= max_pending:
+                write(pending.popleft())
+        while pending:
+            write(pending.popleft())
+    stream.flush()
+    reader.join()
+    if failure:
+        raise failure[0]
+    if progress > 0:
+        report_progress(count, start, done=True)
+    return count
+
+
+def main(batch_size: Optional[int] = None, key: Optional[str] = None,
+         progress: Optional[int] = None,
+         workers: Optional[int] = None) -> None:
     """
     Function to start the logging from db
+
+    Rows are streamed in batches (see iter_batches). Unset arguments are
+    read from the PERSONAL_DATA_EXPORT_BATCH_SIZE (default 1000),
+    PERSONAL_DATA_EXPORT_KEY, PERSONAL_DATA_EXPORT_PROGRESS (report every
+    n rows, 0 to disable) and PERSONAL_DATA_EXPORT_WORKERS (0, the default,
+    logs on this thread; otherwise the number of pipeline() worker
+    processes) environment variables.
     """
+    if batch_size is None:
+        batch_size = int(os.getenv('PERSONAL_DATA_EXPORT_BATCH_SIZE', 1000))
+    if key is None:
+        key = os.getenv('PERSONAL_DATA_EXPORT_KEY') or None
+    if progress is None:
+        progress = int(os.getenv('PERSONAL_DATA_EXPORT_PROGRESS', 0))
+    if workers is None:
+        workers = int(os.getenv('PERSONAL_DATA_EXPORT_WORKERS', 0))
+
     db = get_db()
+    if workers > 0:
+        try:
+            pipeline(iter_batches(db, batch_size, key), workers,
+                     progress=progress)
+        finally:
+            db.close()
+        return
+
     logger = get_logger()
 
-    cursor = db.cursor()
-    cursor.execute("SELECT * FROM users;")
-    heading = cursor.column_names
-
-    for row in cursor:
-        rowDict = dict(zip(heading, row))
-        # print(rowDict)
-        msg = '; '.join('='.join((str(key), str(val))) for (key, val) in
-                        rowDict.items()) + ';'
-        logger.info(msg)
-    cursor.close()
+    msg = None
+    count = 0
+    next_report = progress
+    start = time.perf_counter()
+    for batch in iter_batches(db, batch_size, key):
+        if msg is None:
+            msg = row_format(tuple(batch[0]))
+        for rowDict in batch:
+            logger.info(msg, rowDict)
+        count += len(batch)
+        if progress > 0 and count >= next_report:
+            report_progress(count, start)
+            next_report = count + progress
+    if progress > 0:
+        report_progress(count, start, done=True)
     db.close()
 
 
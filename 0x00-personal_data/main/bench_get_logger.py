@@ -0,0 +1,28 @@
+#!/usr/bin/env python3
+"""
+Benchmark of the per-line logging cost over repeated get_logger calls
+"""
+
+import io
+import sys
+import time
+
+get_logger = __import__('filtered_logger').get_logger
+
+LINES = 20000
+message = "name=Bob;email=bob@dylan.com;ssn=000-123-0000;password=bobby2019;"
+
+sys.stderr = io.StringIO()
+calls = 0
+for target in (1, 10, 100, 1000):
+    while calls < target:
+        logger = get_logger()
+        calls += 1
+    start = time.perf_counter()
+    for _ in range(LINES):
+        logger.info(message)
+    per_line = (time.perf_counter() - start) / LINES * 1e6
+    sys.stderr.seek(0)
+    sys.stderr.truncate()
+    print("after {:>4} get_logger() calls: {:.2f} us/line, {} handler(s)"
+          .format(calls, per_line, len(logger.handlers)))
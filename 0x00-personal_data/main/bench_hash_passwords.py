@@ -0,0 +1,42 @@
+#!/usr/bin/env python3
+"""
+Benchmark of batch bcrypt hashing and verification against a serial loop
+"""
+
+import time
+
+encrypt_password = __import__('encrypt_password')
+
+
+def main():
+    """ Time serial and batch hashing, then verification """
+    passwords = ["MyAmazingPassw0rd{}".format(i) for i in range(8)]
+
+    start = time.perf_counter()
+    hashed = [encrypt_password.hash_password(pwd) for pwd in passwords]
+    serial = time.perf_counter() - start
+    print("serial hash_password: {:.1f} hashes/s".format(
+        len(passwords) / serial))
+
+    start = time.perf_counter()
+    hashed = encrypt_password.hash_passwords(passwords)
+    batch = time.perf_counter() - start
+    print("hash_passwords: {:.1f} hashes/s ({:.2f}x)".format(
+        len(passwords) / batch, serial / batch))
+
+    pairs = list(zip(hashed, passwords))
+    start = time.perf_counter()
+    serial_ok = [encrypt_password.is_valid(*pair) for pair in pairs]
+    serial = time.perf_counter() - start
+    print("serial is_valid: {:.1f} checks/s".format(len(pairs) / serial))
+
+    start = time.perf_counter()
+    batch_ok = encrypt_password.verify_many(pairs)
+    batch = time.perf_counter() - start
+    print("verify_many: {:.1f} checks/s ({:.2f}x)".format(
+        len(pairs) / batch, serial / batch))
+    assert batch_ok == serial_ok == [True] * len(pairs)
+
+
+if __name__ == '__main__':
+    main()
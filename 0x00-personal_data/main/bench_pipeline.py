@@ -0,0 +1,48 @@
+#!/usr/bin/env python3
+"""
+Benchmark of the redact-and-log pipeline against the number of workers
+"""
+
+import io
+import os
+import time
+
+filtered_logger = __import__('filtered_logger')
+
+HEADING = ('name', 'email', 'phone', 'ssn', 'password', 'ip',
+           'last_login', 'user_agent')
+ROWS = 200000
+BATCH_SIZE = 1000
+
+
+def batches():
+    """ Synthetic users table, in batches of row dicts """
+    for start in range(0, ROWS, BATCH_SIZE):
+        yield [dict(zip(HEADING, ("User {}".format(i),
+                                  "user{}@example.com".format(i),
+                                  "(473) 401-4253", "261-72-6780", "K5?BMNv",
+                                  "60ed:c396:2ff:244", "2019-11-14 06:14:24",
+                                  "Mozilla/5.0 (Windows NT 10.0; Win64)")))
+               for i in range(start, min(start + BATCH_SIZE, ROWS))]
+
+
+def main():
+    """ Time the serial formatting, then the pipeline per workers count """
+    start = time.perf_counter()
+    for batch in batches():
+        filtered_logger.format_batch(batch)
+    serial = ROWS / (time.perf_counter() - start)
+    print("serial: {:.0f} rows/s".format(serial))
+
+    workers = 1
+    while workers <= (os.cpu_count() or 1):
+        start = time.perf_counter()
+        filtered_logger.pipeline(batches(), workers, io.StringIO())
+        rate = ROWS / (time.perf_counter() - start)
+        print("{} worker(s): {:.0f} rows/s ({:.2f}x)".format(
+            workers, rate, rate / serial))
+        workers *= 2
+
+
+if __name__ == '__main__':
+    main()
@@ -2,18 +2,116 @@
 """ Module of Users views
 """
 from api.v1.views import app_views
-from flask import abort, jsonify, request
+from datetime import datetime, timezone
+from flask import Response, abort, json, jsonify, request, stream_with_context
 from models.user import User
+import hashlib
+
+
+MAX_LIMIT = 1000
+STREAM_CHUNK = 100
+
+
+def not_modified(etag: str, last_modified: datetime) -> bool:
+    """ Whether the client copy is current: If-None-Match lists the ETag
+    or, without If-None-Match, If-Modified-Since is not before the last
+    modification
+    """
+    if request.if_none_match:
+        return request.if_none_match.contains(etag)
+    since = request.if_modified_since
+    if since is None or last_modified is None:
+        return False
+    if since.tzinfo is not None:
+        since = since.astimezone(timezone.utc).replace(tzinfo=None)
+    return last_modified.replace(microsecond=0) <= since
+
+
+def conditional(response: Response, etag: str,
+                last_modified: datetime) -> Response:
+    """ Set the ETag and Last-Modified headers of a response
+    """
+    response.set_etag(etag)
+    if last_modified is not None:
+        response.last_modified = last_modified.replace(tzinfo=timezone.utc)
+    return response
+
+
+def user_response(user: User) -> Response:
+    """ User object JSON represented, or 304 if the client has it already.
+    The ETag is a hash of the body, since timestamps may be stored to the
+    second only, so a 304 still encodes and hashes the body unless both are
+    cached on the user (BASE_MEMOIZE=1), until it changes
+    """
+    body = user.cached('response', lambda: json.dumps(user.to_json()) + "\n")
+    etag = user.cached('etag', lambda: hashlib.sha1(
+        body.encode('utf-8')).hexdigest())
+    if not_modified(etag, user.updated_at):
+        return conditional(Response(status=304), etag, user.updated_at)
+    return conditional(Response(body, mimetype='application/json'), etag,
+                       user.updated_at)
+
+
+def stream_users():
+    """ All users as the pieces of one JSON array, STREAM_CHUNK users at a
+    time, so memory does not grow with the number of users
+    """
+    yield "["
+    chunk = []
+    separator = ""
+    for user in User.iter_all(chunk_size=STREAM_CHUNK):
+        chunk.append(user.to_json())
+        if len(chunk) == STREAM_CHUNK:
+            yield separator + json.dumps(chunk)[1:-1]
+            separator = ","
+            chunk = []
+    if chunk:
+        yield separator + json.dumps(chunk)[1:-1]
+    yield "]\n"
 
 
 @app_views.route('/users', methods=['GET'], strict_slashes=False)
 def view_all_users() -> str:
     """ GET /api/v1/users
+    Query parameters (optional):
+      - limit: number of users per page (1 to MAX_LIMIT)
+      - cursor: page to return, from the Link header of the previous one
     Return:
-      - list of all User objects JSON represented
+      - list of all User objects JSON represented, ordered by ID and
+        streamed in chunks
+      - with limit or cursor, one page of it, and a Link header to the
+        next page unless it is the last one
+      - 304 if the client copy is current (If-None-Match with the ETag,
+        which changes with any user, or If-Modified-Since)
+      - 400 if limit or cursor is invalid
     """
-    all_users = [user.to_json() for user in User.all()]
-    return jsonify(all_users)
+    version, changed_at = User.version()
+    etag = "users-{}-{}".format(version, hashlib.sha1(
+        request.query_string).hexdigest()[:16])
+    if not_modified(etag, changed_at):
+        return conditional(Response(status=304), etag, changed_at)
+    limit = request.args.get('limit')
+    cursor = request.args.get('cursor')
+    if limit is None and cursor is None:
+        return conditional(Response(stream_with_context(stream_users()),
+                                    mimetype='application/json'),
+                           etag, changed_at)
+    try:
+        limit = MAX_LIMIT if limit is None else int(limit)
+        if limit < 1 or limit > MAX_LIMIT:
+            raise ValueError
+    except ValueError:
+        return jsonify({'error': "limit must be between 1 and {}"
+                        .format(MAX_LIMIT)}), 400
+    try:
+        users, next_cursor = User.page(limit=limit, cursor=cursor)
+    except ValueError:
+        return jsonify({'error': "invalid cursor"}), 400
+    response = jsonify([user.to_json() for user in users])
+    if next_cursor is not None:
+        response.headers['Link'] = '<{}?limit={}&cursor={}>; rel="next"' \
+            .format(request.base_url, limit, next_cursor)
+    return conditional(response, etag, changed_at)
 
 
 @app_views.route('/users/<user_id>', methods=['GET'], strict_slashes=False)
@@ -23,6 +121,8 @@ def view_one_user(user_id: str = None) -> str:
       - User ID
     Return:
       - User object JSON represented
+      - 304 if the client copy is current (If-None-Match with the ETag,
+        a SHA-1 of the body, or If-Modified-Since)
       - 404 if the User ID doesn't exist
     """
     if user_id is None:
@@ -30,7 +130,7 @@ def view_one_user(user_id: str = None) -> str:
     user = User.get(user_id)
     if user is None:
         abort(404)
-    return jsonify(user.to_json())
+    return user_response(user)
 
 
 @app_views.route('/users/<user_id>', methods=['DELETE'], strict_slashes=False)
@@ -0,0 +1,274 @@
+#!/usr/bin/env python3
+""" Snapshot file formats of the JSON storage engine
+"""
+from typing import BinaryIO, Iterator, TextIO
+import io
+import json
+import pickle
+import struct
+
+
+LOAD_CHUNK_SIZE = 1 << 16
+
+
+def iter_json_object(f: TextIO, chunk_size: int = LOAD_CHUNK_SIZE,
+                     raw: bool = False) -> Iterator[tuple]:
+    """ Parse a file holding one JSON object incrementally, yielding its
+    (key, value) pairs as they are read, so only one value is held in memory
+    at a time besides the read buffer. With raw, values are yielded as
+    their JSON text
+    """
+    decoder = json.JSONDecoder()
+    buf = ""
+    pos = 0
+    eof = False
+
+    def fill() -> bool:
+        nonlocal buf, pos, eof
+        if eof:
+            return False
+        chunk = f.read(chunk_size)
+        if not chunk:
+            eof = True
+            return False
+        buf = buf[pos:] + chunk
+        pos = 0
+        return True
+
+    def skip_ws():
+        nonlocal pos
+        while True:
+            while pos < len(buf) and buf[pos] in " \t\r\n":
+                pos += 1
+            if pos < len(buf) or not fill():
+                return
+
+    def expect(chars: str) -> str:
+        nonlocal pos
+        skip_ws()
+        if pos >= len(buf) or buf[pos] not in chars:
+            raise ValueError("expected one of {!r} at offset {}"
+                             .format(chars, pos))
+        pos += 1
+        return buf[pos - 1]
+
+    def decode(text: bool = False):
+        nonlocal pos
+        skip_ws()
+        while True:
+            try:
+                value, end = decoder.raw_decode(buf, pos)
+            except json.JSONDecodeError:
+                if not fill():
+                    raise
+                continue
+            if end == len(buf) and fill():
+                continue
+            if text:
+                value = buf[pos:end]
+            pos = end
+            return value
+
+    expect("{")
+    skip_ws()
+    if pos < len(buf) and buf[pos] == "}":
+        return
+    while True:
+        key = decode()
+        expect(":")
+        yield key, decode(raw)
+        if expect(",}") == "}":
+            return
+
+
+class JSONSerializer():
+    """ One JSON object of records by ID (.db_<Class>.json). Raw records
+    are their JSON text, about a third of the size of the parsed dict
+    """
+    name = "json"
+    extension = "json"
+
+    def dump(self, objs: dict, f: BinaryIO):
+        """ Write records by ID
+        """
+        text = io.TextIOWrapper(f, encoding='utf-8')
+        json.dump(objs, text)
+        text.flush()
+        text.detach()
+
+    def iter_records(self, f: BinaryIO,
+                     stream: bool = False) -> Iterator[tuple]:
+        """ Read (ID, record) pairs: with json.load, or incrementally with
+        stream, which is slower but never holds the whole document
+        """
+        text = io.TextIOWrapper(f, encoding='utf-8')
+        try:
+            if stream:
+                yield from iter_json_object(text)
+            else:
+                yield from json.load(text).items()
+        finally:
+            text.detach()
+
+    def iter_raw_records(self, f: BinaryIO) -> Iterator[tuple]:
+        """ Read (ID, raw record) pairs, incrementally
+        """
+        text = io.TextIOWrapper(f, encoding='utf-8')
+        try:
+            yield from iter_json_object(text, raw=True)
+        finally:
+            text.detach()
+
+    def load_record(self, raw: str) -> dict:
+        """ Record of a raw record
+        """
+        return json.loads(raw)
+
+
+class PickleSerializer():
+    """ The records by ID, pickled with protocol 5 (.db_<Class>.pickle).
+    Only load files written by this application: unpickling runs code
+    """
+    name = "pickle"
+    extension = "pickle"
+
+    def dump(self, objs: dict, f: BinaryIO):
+        """ Write records by ID
+        """
+        pickle.dump(objs, f, protocol=5)
+
+    def iter_records(self, f: BinaryIO,
+                     stream: bool = False) -> Iterator[tuple]:
+        """ Read (ID, record) pairs, all at once whatever stream says
+        """
+        yield from pickle.load(f).items()
+
+    iter_raw_records = iter_records
+
+    def load_record(self, raw: dict) -> dict:
+        """ Record of a raw record: raw records are the records
+        """
+        return raw
+
+
+class BinarySerializer():
+    """ Compact record layout (.db_<Class>.bin), stdlib only:
+
+        magic b"HBDB1\\n", uint32 length of a JSON list of column names,
+        the list, then per record one int32 per column (length of its
+        UTF-8 value; -1 absent, -2 null, <= -3 a JSON value of length
+        -3 - n) followed by the values. Column 0 is the record ID.
+
+    Keys are written once and string values, the common case, are stored
+    without quoting or escaping
+    """
+    name = "binary"
+    extension = "bin"
+    MAGIC = b"HBDB1\n"
+    ABSENT = -1
+    NULL = -2
+
+    def dump(self, objs: dict, f: BinaryIO):
+        """ Write records by ID
+        """
+        columns = {"": 0}
+        for record in objs.values():
+            for key in record:
+                if key not in columns:
+                    columns[key] = len(columns)
+        header = json.dumps(list(columns)).encode('utf-8')
+        f.write(self.MAGIC + struct.pack('<I', len(header)) + header)
+        lengths = struct.Struct('<{}i'.format(len(columns)))
+        keys = list(columns)[1:]
+        chunks = []
+        for obj_id, record in objs.items():
+            sizes = []
+            values = [obj_id.encode('utf-8')]
+            sizes.append(len(values[0]))
+            for key in keys:
+                if key not in record:
+                    sizes.append(self.ABSENT)
+                    continue
+                value = record[key]
+                if type(value) is str:
+                    data = value.encode('utf-8')
+                    sizes.append(len(data))
+                elif value is None:
+                    sizes.append(self.NULL)
+                    continue
+                else:
+                    data = json.dumps(value).encode('utf-8')
+                    sizes.append(-3 - len(data))
+                values.append(data)
+            chunks.append(lengths.pack(*sizes))
+            chunks.extend(values)
+            if len(chunks) >= 4096:
+                f.write(b"".join(chunks))
+                chunks = []
+        f.write(b"".join(chunks))
+
+    def iter_records(self, f: BinaryIO,
+                     stream: bool = False) -> Iterator[tuple]:
+        """ Read (ID, record) pairs, one record at a time whatever stream
+        says
+        """
+        if f.read(len(self.MAGIC)) != self.MAGIC:
+            raise ValueError("not a binary store file")
+        size, = struct.unpack('<I', f.read(4))
+        keys = json.loads(f.read(size).decode('utf-8'))[1:]
+        lengths = struct.Struct('<{}i'.format(len(keys) + 1))
+        read = f.read
+        while True:
+            head = read(lengths.size)
+            if not head:
+                return
+            if len(head) < lengths.size:
+                raise ValueError("truncated binary store file")
+            sizes = lengths.unpack(head)
+            payload = read(sum(n if n >= 0 else max(-3 - n, 0)
+                               for n in sizes))
+            pos = sizes[0]
+            obj_id = payload[:pos].decode('utf-8')
+            record = {}
+            for key, n in zip(keys, sizes[1:]):
+                if n >= 0:
+                    record[key] = payload[pos:pos + n].decode('utf-8')
+                    pos += n
+                elif n == self.NULL:
+                    record[key] = None
+                elif n != self.ABSENT:
+                    n = -3 - n
+                    record[key] = json.loads(payload[pos:pos + n])
+                    pos += n
+            yield obj_id, record
+
+    iter_raw_records = iter_records
+
+    def load_record(self, raw: dict) -> dict:
+        """ Record of a raw record: raw records are the records
+        """
+        return raw
+
+
+SERIALIZERS = {serializer.name: serializer for serializer in
+               (JSONSerializer(), PickleSerializer(), BinarySerializer())}
+
+
+def get_serializer(name: str):
+    """ Serializer by name: json, pickle or binary
+    """
+    if name not in SERIALIZERS:
+        raise ValueError("serializer must be one of {}"
+                         .format(tuple(SERIALIZERS)))
+    return SERIALIZERS[name]
+
+
+def convert(src_path: str, src: str, dst_path: str, dst: str) -> int:
+    """ Rewrite a snapshot file from one format to another, return how
+    many records it holds
+    """
+    with open(src_path, 'rb') as f:
+        objs = dict(get_serializer(src).iter_records(f))
+    with open(dst_path, 'wb') as f:
+        get_serializer(dst).dump(objs, f)
+    return len(objs)
@@ -0,0 +1,303 @@
+#!/usr/bin/env python3
+""" SQLite storage engine
+"""
+from datetime import datetime
+from typing import TypeVar, List, Any, Tuple
+import json
+import sqlite3
+import threading
+import uuid
+from models.query import Range, Prefix, In, matches_all
+
+
+class SQLiteStorage():
+    """ Keeps each class in a table of a SQLite database
+
+    Every row holds the object ID, its serialized JSON record and one column
+    per attribute listed in the class `_indexes` or `_sorted_indexes`, each
+    with a real SQL index, which also serves Range, Prefix and In
+    predicates. Each save() and remove() is its own transaction. Objects are
+    built from the database on every get() and search(), so changes made by
+    other processes sharing the file are seen.
+    """
+
+    def __init__(self, file_path: str = ".db.sqlite3"):
+        """ Initialize a storage on a database file
+        """
+        self.file_path = file_path
+        self.local = threading.local()
+        self.tables = {}
+        self.tables_lock = threading.Lock()
+
+    def connection(self) -> sqlite3.Connection:
+        """ Connection of the current thread
+        """
+        conn = getattr(self.local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.file_path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self.local.conn = conn
+        return conn
+
+    def table(self, cls) -> str:
+        """ Name of the table of a class, created (or given missing index
+        columns) on first use
+        """
+        s_class = cls.__name__
+        if s_class in self.tables:
+            return self.tables[s_class]
+        with self.tables_lock:
+            conn = self.connection()
+            table = '"{}"'.format(s_class.replace('"', '""'))
+            with conn:
+                conn.execute("CREATE TABLE IF NOT EXISTS _versions (class "
+                             "TEXT PRIMARY KEY, generation TEXT NOT NULL, "
+                             "version INTEGER NOT NULL, changed_at TEXT)")
+                conn.execute("CREATE TABLE IF NOT EXISTS {} (id TEXT PRIMARY "
+                             "KEY, data TEXT NOT NULL)".format(table))
+                columns = [row[1] for row in
+                           conn.execute("PRAGMA table_info({})"
+                                        .format(table))]
+                for attr in self.index_attrs(cls):
+                    column = self.column(attr)
+                    if attr not in columns:
+                        conn.execute("ALTER TABLE {} ADD COLUMN {}"
+                                     .format(table, column))
+                        rows = conn.execute("SELECT id, data FROM {}"
+                                            .format(table)).fetchall()
+                        conn.executemany(
+                            "UPDATE {} SET {} = ? WHERE id = ?"
+                            .format(table, column),
+                            [(json.loads(data).get(attr), obj_id)
+                             for obj_id, data in rows])
+                    conn.execute('CREATE INDEX IF NOT EXISTS "{}_{}" ON {} '
+                                 '({})'.format(s_class, attr, table, column))
+            self.tables[s_class] = table
+        return table
+
+    @staticmethod
+    def index_attrs(cls) -> List[str]:
+        """ Attributes of a class with an index column (the ID is the
+        primary key)
+        """
+        attrs = []
+        for attr in cls._indexes + cls._sorted_indexes:
+            if attr != 'id' and attr not in attrs:
+                attrs.append(attr)
+        return attrs
+
+    @staticmethod
+    def sql_value(value: Any) -> Any:
+        """ Value to compare an index column with, as stored in records;
+        datetimes are truncated to the second like serialized timestamps
+        """
+        if type(value) is datetime:
+            return value.replace(microsecond=0).isoformat()
+        if isinstance(value, (str, int, float)):
+            return value
+        raise TypeError("{!r} is not an SQL value".format(value))
+
+    def where(self, attr: str, condition: Any) -> tuple:
+        """ SQL condition (and parameters) on the index column of an
+        attribute selecting at least the rows matching a search condition,
+        or None
+        """
+        column = self.column(attr)
+        try:
+            if isinstance(condition, Range):
+                where = []
+                params = []
+                for op, bound in ((">=", condition.gt), (">=", condition.ge),
+                                  ("<=", condition.lt), ("<=", condition.le)):
+                    if bound is not None:
+                        where.append("{} {} ?".format(column, op))
+                        params.append(self.sql_value(bound))
+                return " AND ".join(where) or "{} IS NOT NULL".format(
+                    column), params
+            if isinstance(condition, Prefix):
+                upper = condition.upper_bound()
+                if upper is None:
+                    return "{} >= ?".format(column), [condition.prefix]
+                return "{0} >= ? AND {0} < ?".format(column), \
+                    [condition.prefix, upper]
+            if isinstance(condition, In):
+                values = [self.sql_value(value) for value in condition.values
+                          if value is not None]
+                where = "{} IN ({})".format(column,
+                                            ", ".join("?" * len(values)))
+                if None in condition.values:
+                    where = "({} OR {} IS NULL)".format(where, column)
+                return where, values
+            if condition is None or \
+                    isinstance(condition, (str, int, float)):
+                return "{} IS ?".format(column), [condition]
+        except TypeError:
+            pass
+        return None
+
+    @staticmethod
+    def column(attr: str) -> str:
+        """ Quoted column name of an indexed attribute
+        """
+        return '"{}"'.format(attr.replace('"', '""'))
+
+    def load(self, cls):
+        """ Make sure the table of a class exists
+        """
+        self.table(cls)
+
+    def save_to_file(self, cls):
+        """ Nothing to do: every change is committed as it is made
+        """
+        self.table(cls)
+
+    def flush(self, cls):
+        """ Nothing to do: every change is committed as it is made
+        """
+
+    def flush_all(self):
+        """ Nothing to do: every change is committed as it is made
+        """
+
+    def save(self, obj: TypeVar('Base')):
+        """ Insert or replace the row of an object
+        """
+        cls = obj.__class__
+        table = self.table(cls)
+        attrs = self.index_attrs(cls)
+        record = obj.to_json(True)
+        names = ["id", "data"] + [self.column(attr) for attr in attrs]
+        values = [obj.id, json.dumps(record)] + \
+            [record.get(attr) for attr in attrs]
+        updates = ", ".join("{0} = excluded.{0}".format(name)
+                            for name in names[1:])
+        conn = self.connection()
+        with conn:
+            conn.execute("INSERT INTO {} ({}) VALUES ({}) ON CONFLICT(id) DO "
+                         "UPDATE SET {}".format(table, ", ".join(names),
+                                                ", ".join("?" * len(names)),
+                                                updates), values)
+            self.changed(conn, cls)
+
+    def remove(self, obj: TypeVar('Base')):
+        """ Delete the row of an object
+        """
+        table = self.table(obj.__class__)
+        conn = self.connection()
+        with conn:
+            if conn.execute("DELETE FROM {} WHERE id = ?".format(table),
+                            (obj.id,)).rowcount:
+                self.changed(conn, obj.__class__)
+
+    def changed(self, conn: sqlite3.Connection, cls):
+        """ Count a change of the objects of a class, in the transaction
+        making it
+        """
+        conn.execute("INSERT INTO _versions VALUES (?, ?, 1, ?) ON "
+                     "CONFLICT(class) DO UPDATE SET version = version + 1, "
+                     "changed_at = excluded.changed_at",
+                     (cls.__name__, uuid.uuid4().hex,
+                      datetime.utcnow().isoformat()))
+
+    def version(self, cls) -> Tuple[str, datetime]:
+        """ Token changing whenever the objects of a class change, shared
+        by every process using the database, and the time of the last
+        change (or None)
+        """
+        self.table(cls)
+        row = self.connection().execute(
+            "SELECT generation, version, changed_at FROM _versions WHERE "
+            "class = ?", (cls.__name__,)).fetchone()
+        if row is None:
+            return "0", None
+        return "{}-{}".format(row[0], row[1]), \
+            datetime.fromisoformat(row[2])
+
+    def count(self, cls) -> int:
+        """ Count all objects of a class
+        """
+        table = self.table(cls)
+        return self.connection().execute(
+            "SELECT COUNT(*) FROM {}".format(table)).fetchone()[0]
+
+    def all(self, cls) -> List[TypeVar('Base')]:
+        """ Return all objects of a class
+        """
+        return self.search(cls)
+
+    def get(self, cls, id: str) -> TypeVar('Base'):
+        """ Return one object of a class by ID
+        """
+        table = self.table(cls)
+        row = self.connection().execute(
+            "SELECT data FROM {} WHERE id = ?".format(table),
+            (id,)).fetchone()
+        if row is None:
+            return None
+        return cls(**json.loads(row[0]))
+
+    def conditions(self, cls, attributes: dict) -> Tuple[list, list]:
+        """ SQL conditions and parameters for the indexed attributes of a
+        search
+        """
+        attrs = self.index_attrs(cls)
+        where = []
+        params = []
+        for k, v in attributes.items():
+            sql = self.where(k, v) if k in attrs else None
+            if sql is not None:
+                where.append(sql[0])
+                params.extend(sql[1])
+        return where, params
+
+    def search(self, cls, attributes: dict = {}) -> List[TypeVar('Base')]:
+        """ Search all objects of a class with matching attributes (values
+        or models.query predicates): indexed attributes in SQL, then every
+        condition on the built objects
+        """
+        table = self.table(cls)
+        where, params = self.conditions(cls, attributes)
+        query = "SELECT data FROM {}".format(table)
+        if where:
+            query += " WHERE " + " AND ".join(where)
+        rows = self.connection().execute(query, params).fetchall()
+        return [obj for obj in (cls(**json.loads(data)) for (data,) in rows)
+                if matches_all(obj, attributes)]
+
+    def page(self, cls, attributes: dict = {}, order: str = 'id',
+             after: tuple = None, limit: int = 100) -> List[TypeVar('Base')]:
+        """ Up to limit objects of a class matching attributes, ordered by
+        (order attribute, ID) and following after, a (value, ID) pair, one
+        keyset query at a time. order must be the ID or an index column
+        """
+        if order != 'id' and order not in self.index_attrs(cls):
+            raise ValueError("{} cannot be ordered by {}"
+                             .format(cls.__name__, order))
+        table = self.table(cls)
+        column = self.column(order)
+        where, params = self.conditions(cls, attributes)
+        where.append("{} IS NOT NULL".format(column))
+        result = []
+        while len(result) < limit:
+            query_where = list(where)
+            query_params = list(params)
+            if after is not None:
+                value = self.sql_value(after[0])
+                query_where.append("({0} > ? OR ({0} = ? AND id > ?))"
+                                   .format(column))
+                query_params.extend([value, value, after[1]])
+            wanted = limit - len(result)
+            rows = self.connection().execute(
+                "SELECT id, {}, data FROM {} WHERE {} ORDER BY {}, id "
+                "LIMIT ?".format(column, table, " AND ".join(query_where),
+                                 column),
+                query_params + [wanted]).fetchall()
+            for _, _, data in rows:
+                obj = cls(**json.loads(data))
+                if matches_all(obj, attributes):
+                    result.append(obj)
+            if len(rows) < wanted:
+                break
+            after = (rows[-1][1], rows[-1][0])
+        return result
@@ -0,0 +1,180 @@
+#!/usr/bin/env python3
+""" Query predicates for Base.search
+
+Values of the attributes dict given to search() are matched by equality,
+or by one of these predicates:
+
+    UserSession.search({'created_at': Range(lt=t)})
+    User.search({'email': Prefix("bob"), 'last_name': In(["A", "B"])})
+
+Engines use them to pick an index: a hash index (`_indexes`) for equality
+and In, a sorted index (`_sorted_indexes`) for any of them, or a scan.
+
+Range compares datetimes to the second, as they are serialized, so every
+engine finds the same objects whether it reads them back from records or
+from memory.
+"""
+from bisect import bisect_left, bisect_right
+from datetime import datetime, timedelta
+from typing import Any, Iterable, List, Tuple
+
+
+def to_second(value: Any) -> Any:
+    """ A datetime truncated to the second, any other value as is
+    """
+    if type(value) is datetime:
+        return value.replace(microsecond=0)
+    return value
+
+
+class Range():
+    """ Values between bounds: gt / ge (lower, exclusive / inclusive) and
+    lt / le (upper, exclusive / inclusive), any of them optional.
+    Datetimes are compared to the second
+    """
+
+    def __init__(self, gt: Any = None, ge: Any = None, lt: Any = None,
+                 le: Any = None):
+        """ Initialize a range
+        """
+        if gt is not None and ge is not None or \
+                lt is not None and le is not None:
+            raise ValueError("one lower and one upper bound at most")
+        self.gt = gt
+        self.ge = ge
+        self.lt = lt
+        self.le = le
+
+    def matches(self, value: Any) -> bool:
+        """ Whether a value is in the range (None never is)
+        """
+        if value is None:
+            return False
+        value = to_second(value)
+        return (self.gt is None or value > to_second(self.gt)) and \
+            (self.ge is None or value >= to_second(self.ge)) and \
+            (self.lt is None or value < to_second(self.lt)) and \
+            (self.le is None or value <= to_second(self.le))
+
+    def slices(self, keys: List) -> List[Tuple[int, int]]:
+        """ Position of the matching values in a sorted list; the keys
+        keep their microseconds, so datetime bounds are moved to the second
+        boundaries instead
+        """
+        start = 0
+        stop = len(keys)
+        if type(self.gt) is datetime:
+            start = bisect_left(keys, to_second(self.gt) + timedelta(0, 1))
+        elif self.gt is not None:
+            start = bisect_right(keys, self.gt)
+        elif self.ge is not None:
+            start = bisect_left(keys, to_second(self.ge))
+        if self.lt is not None:
+            stop = bisect_left(keys, to_second(self.lt))
+        elif type(self.le) is datetime:
+            stop = bisect_left(keys, to_second(self.le) + timedelta(0, 1))
+        elif self.le is not None:
+            stop = bisect_right(keys, self.le)
+        return [(start, max(start, stop))]
+
+    def __repr__(self) -> str:
+        """ Representation with the bounds set
+        """
+        return "Range({})".format(", ".join(
+            "{}={!r}".format(name, getattr(self, name))
+            for name in ("gt", "ge", "lt", "le")
+            if getattr(self, name) is not None))
+
+
+class Prefix():
+    """ Strings starting with a prefix
+    """
+
+    def __init__(self, prefix: str):
+        """ Initialize a prefix match
+        """
+        self.prefix = prefix
+
+    def matches(self, value: Any) -> bool:
+        """ Whether a value is a string starting with the prefix
+        """
+        return type(value) is str and value.startswith(self.prefix)
+
+    def upper_bound(self) -> str:
+        """ Smallest string greater than every string with the prefix, or
+        None if there is none
+        """
+        prefix = self.prefix
+        while prefix and ord(prefix[-1]) == 0x10ffff:
+            prefix = prefix[:-1]
+        if not prefix:
+            return None
+        return prefix[:-1] + chr(ord(prefix[-1]) + 1)
+
+    def slices(self, keys: List) -> List[Tuple[int, int]]:
+        """ Position of the matching values in a sorted list
+        """
+        start = bisect_left(keys, self.prefix)
+        upper = self.upper_bound()
+        stop = len(keys) if upper is None else bisect_left(keys, upper)
+        return [(start, stop)]
+
+    def __repr__(self) -> str:
+        """ Representation with the prefix
+        """
+        return "Prefix({!r})".format(self.prefix)
+
+
+class In():
+    """ Values equal to one of a collection
+    """
+
+    def __init__(self, values: Iterable):
+        """ Initialize a membership match
+        """
+        self.values = list(values)
+
+    def matches(self, value: Any) -> bool:
+        """ Whether a value is one of the values
+        """
+        return value in self.values
+
+    def slices(self, keys: List) -> List[Tuple[int, int]]:
+        """ Positions of the matching values in a sorted list
+        """
+        return [(bisect_left(keys, value), bisect_right(keys, value))
+                for value in set(self.values)]
+
+    def __repr__(self) -> str:
+        """ Representation with the values
+        """
+        return "In({!r})".format(self.values)
+
+
+PREDICATES = (Range, Prefix, In)
+
+
+def matches(condition: Any, value: Any) -> bool:
+    """ Whether a value satisfies a search condition: a predicate, or a
+    value to be equal to
+    """
+    if isinstance(condition, PREDICATES):
+        return condition.matches(value)
+    return value == condition
+
+
+def matches_all(obj: Any, attributes: dict) -> bool:
+    """ Whether an object satisfies every condition of a search
+    """
+    for attr, condition in attributes.items():
+        if not matches(condition, getattr(obj, attr)):
+            return False
+    return True
+
+
+def slices(condition: Any, keys: List) -> List[Tuple[int, int]]:
+    """ Positions in a sorted list of the values satisfying a condition
+    """
+    if isinstance(condition, PREDICATES):
+        return condition.slices(keys)
+    return [(bisect_left(keys, condition), bisect_right(keys, condition))]
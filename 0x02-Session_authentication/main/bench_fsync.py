@@ -0,0 +1,32 @@
+#!/usr/bin/env python3
+""" Benchmark of User.save latency under each fsync policy, rewriting the
+whole file or appending to the journal
+"""
+import os
+import sys
+import tempfile
+import time
+from models.engine.json_storage import FSYNC_POLICIES
+from models.user import User
+
+USERS = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+SAVES = 100
+
+os.chdir(tempfile.mkdtemp())
+User._journal = True
+User.load_from_file()
+users = [User(email="user{}@hbtn.io".format(i)) for i in range(USERS)]
+for user in users:
+    user.save()
+
+print("{} users".format(USERS))
+for journal in (False, True):
+    User._journal = journal
+    for policy in FSYNC_POLICIES:
+        User._fsync = policy
+        start = time.perf_counter()
+        for user in users[:SAVES]:
+            user.save()
+        print("  {:<8} {:<8} {:>9.0f} us/save".format(
+            "journal" if journal else "file", policy,
+            (time.perf_counter() - start) / SAVES * 1e6))
@@ -0,0 +1,42 @@
+#!/usr/bin/env python3
+""" Benchmark of listing every User as dicts: all() against iter_all(),
+and the first page of page(): time to the first object, total time and
+peak memory allocated by the listing
+"""
+import sys
+import time
+import tracemalloc
+from models.user import User
+
+User._storage.save_to_file = lambda cls: None
+
+size = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+for i in range(size):
+    User(email="user{}@hbtn.io".format(i)).save()
+User.page({}, 1)
+
+
+def listing(name, objs):
+    """ Turn objs into dicts one at a time, as a streamed response would
+    """
+    tracemalloc.start()
+    start = time.perf_counter()
+    first = None
+    count = 0
+    for obj in objs():
+        obj.to_json()
+        if first is None:
+            first = time.perf_counter() - start
+        count += 1
+    total = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    print("  {:<12} {:>7} objects, first {:8.2f} ms, total {:7.2f} s, "
+          "peak {:6.1f} MB".format(name, count, first * 1e3, total,
+                                   peak / 1e6))
+
+
+print("{} users".format(size))
+listing("all()", User.all)
+listing("iter_all()", User.iter_all)
+listing("page(100)", lambda: User.page({}, 100)[0])
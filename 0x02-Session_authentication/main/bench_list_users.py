@@ -0,0 +1,64 @@
+#!/usr/bin/env python3
+""" Load test of GET /api/v1/users through the Flask test client: p50/p99
+latency and peak memory per request of the former jsonify of the whole
+list, the streamed listing, one page of 100 and a poll answered 304 by
+If-None-Match, by number of users
+"""
+import statistics
+import sys
+import time
+import tracemalloc
+from flask import jsonify
+from api.v1.app import app
+from models.user import User
+
+User._storage.save_to_file = lambda cls: None
+sizes = [int(arg) for arg in sys.argv[1:]] or [1000, 10000, 100000]
+
+
+@app.route('/bench/users_jsonify')
+def users_jsonify() -> str:
+    """ The listing as it was: every user to_json() then jsonify'ed
+    """
+    return jsonify([user.to_json() for user in User.all()])
+
+
+def load(client, url: str, requests: int, headers: dict = {}) -> tuple:
+    """ p50 and p99 latency (ms) and peak memory (MB) of requests to url,
+    reading each response body to the end
+    """
+    latencies = []
+    peak = 0
+    for _ in range(requests):
+        tracemalloc.start()
+        start = time.perf_counter()
+        response = client.get(url, headers=headers)
+        for _ in response.response:
+            pass
+        latencies.append((time.perf_counter() - start) * 1e3)
+        peak = max(peak, tracemalloc.get_traced_memory()[1])
+        tracemalloc.stop()
+        response.close()
+    latencies.sort()
+    return (statistics.median(latencies),
+            latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))],
+            peak / 1e6)
+
+
+client = app.test_client()
+count = 0
+for size in sizes:
+    while count < size:
+        User(email="user{}@hbtn.io".format(count)).save()
+        count += 1
+    requests = max(5, 100000 // size)
+    print("{} users, {} requests each".format(size, requests))
+    etag = client.get("/api/v1/users").headers['ETag']
+    for name, url, headers in (
+            ("jsonify", "/bench/users_jsonify", {}),
+            ("streamed", "/api/v1/users", {}),
+            ("limit=100", "/api/v1/users?limit=100", {}),
+            ("304", "/api/v1/users", {'If-None-Match': etag})):
+        p50, p99, peak = load(client, url, requests, headers)
+        print("  {:<10} p50 {:8.1f} ms  p99 {:8.1f} ms  peak {:7.1f} MB"
+              .format(name, p50, p99, peak))
@@ -0,0 +1,50 @@
+#!/usr/bin/env python3
+""" Benchmark of User.load_from_file startup time and peak RSS: the default
+json.load, the streaming loader (BASE_STREAM_LOAD) and the lazy loader
+(BASE_LAZY_LOAD)
+"""
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+if len(sys.argv) > 2 and sys.argv[1] == "load":
+    from models.user import User
+    User._stream_load = sys.argv[2] == "streaming"
+    User._lazy_load = sys.argv[2] == "lazy"
+    start = time.perf_counter()
+    User.load_from_file()
+    elapsed = time.perf_counter() - start
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    print("{:>10}: {:.2f}s, peak RSS {:.0f} MB".format(
+        sys.argv[2], elapsed, peak))
+    sys.exit(0)
+
+size = int(sys.argv[1]) if len(sys.argv) > 1 else 1000000
+os.chdir(tempfile.mkdtemp())
+with open(".db_User.json", "w") as f:
+    f.write("{")
+    for i in range(size):
+        obj_id = "{:036d}".format(i)
+        f.write("{}{}: {}".format("," if i else "", json.dumps(obj_id),
+                                  json.dumps({
+                                      "id": obj_id,
+                                      "created_at": "2024-04-22T12:00:15",
+                                      "updated_at": "2024-04-22T12:00:32",
+                                      "email": "user{}@hbtn.io".format(i),
+                                      "_password": "7a321db83885ebbe8358bc"
+                                                   "1160c803af6cc70c80aa8f",
+                                      "first_name": None,
+                                      "last_name": None})))
+    f.write("}")
+print("{} users, {:.0f} MB file".format(
+    size, os.path.getsize(".db_User.json") / 1e6))
+
+env = dict(os.environ, PYTHONPATH=os.path.dirname(os.path.dirname(
+    os.path.abspath(__file__))))
+for mode in ("json.load", "streaming", "lazy"):
+    subprocess.run([sys.executable, os.path.abspath(__file__), "load", mode],
+                   env=env, check=True)
@@ -0,0 +1,50 @@
+#!/usr/bin/env python3
+""" Benchmark of memory per User and UserSession object, against the same
+attributes stored in a per-instance __dict__
+"""
+import sys
+import tracemalloc
+import uuid
+from datetime import datetime
+from models.user import User
+from models.user_session import UserSession
+
+COUNT = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+
+
+class DictObject():
+    """ Object keeping its attributes in a __dict__, like models did
+    """
+
+    def __init__(self, **kwargs):
+        self.id = str(uuid.uuid4())
+        self.created_at = datetime.utcnow()
+        self.updated_at = datetime.utcnow()
+        for key, value in kwargs.items():
+            setattr(self, key, value)
+
+
+def bytes_per_object(factory) -> float:
+    """ Average memory allocated by one object made by factory
+    """
+    tracemalloc.start()
+    objs = [factory(i) for i in range(COUNT)]
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del objs
+    return size / COUNT
+
+
+for name, before, after in (
+        ("User",
+         lambda i: DictObject(email="u{}@hbtn.io".format(i), _password=None,
+                              first_name=None, last_name=None),
+         lambda i: User(email="u{}@hbtn.io".format(i))),
+        ("UserSession",
+         lambda i: DictObject(user_id="u{}".format(i),
+                              session_id="s{}".format(i)),
+         lambda i: UserSession(user_id="u{}".format(i),
+                               session_id="s{}".format(i)))):
+    dict_size, slots_size = bytes_per_object(before), bytes_per_object(after)
+    print("{}: {:.0f} bytes/object with __dict__, {:.0f} with __slots__"
+          .format(name, dict_size, slots_size))
@@ -0,0 +1,49 @@
+#!/usr/bin/env python3
+""" Benchmark of User.search with Range, Prefix and In predicates, through
+the planner and as a full scan
+"""
+import sys
+import time
+from datetime import datetime, timedelta
+from models.query import Range, Prefix, In
+from models.user import User
+
+User._storage.save_to_file = lambda cls: None
+SEARCHES = 20
+
+size = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+start_time = datetime(2024, 1, 1)
+for i in range(size):
+    user = User(email="user{}@hbtn.io".format(i),
+                created_at=(start_time + timedelta(seconds=i)).isoformat())
+    user.save()
+
+queries = {
+    "Range created_at (0.1%)": [
+        {'created_at': Range(ge=start_time + timedelta(seconds=n),
+                             lt=start_time + timedelta(seconds=n + size //
+                                                       1000))}
+        for n in range(0, size, size // SEARCHES)],
+    "Prefix email": [{'email': Prefix("user{}1".format(n))}
+                     for n in range(SEARCHES)],
+    "In email (10 values)": [
+        {'email': In("user{}@hbtn.io".format(n + k) for k in range(10))}
+        for n in range(0, size, size // SEARCHES)],
+}
+
+print("{} users".format(size))
+User.search({'created_at': Range(lt=start_time)})
+User.search({'email': Prefix("")})
+for name, conditions in queries.items():
+    start = time.perf_counter()
+    found = [len(User.search(condition)) for condition in conditions]
+    planned = (time.perf_counter() - start) / len(conditions) * 1e3
+
+    start = time.perf_counter()
+    for condition, n in zip(conditions, found):
+        (attr, predicate), = condition.items()
+        assert n == len([u for u in User.all()
+                         if predicate.matches(getattr(u, attr))])
+    scan = (time.perf_counter() - start) / len(conditions) * 1e3
+    print("  {:<24} planned {:8.3f} ms, full scan {:8.3f} ms".format(
+        name, planned, scan))
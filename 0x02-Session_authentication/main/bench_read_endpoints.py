@@ -0,0 +1,46 @@
+#!/usr/bin/env python3
+""" Benchmark of the read endpoints through the Flask test client, with
+and without memoized to_json() and response bodies: requests per second
+of GET /api/v1/users/<id> on 100 polled users and of pages of 100 users,
+and to_json() calls per second
+"""
+import random
+import sys
+import time
+from api.v1.app import app
+from models.user import User
+
+User._storage.save_to_file = lambda cls: None
+size = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+DURATION = 2
+
+for i in range(size):
+    user = User(email="user{}@hbtn.io".format(i), first_name="First",
+                last_name="Last")
+    user.password = "pwd{}".format(i)
+    user.save()
+users = User.all()[:100]
+client = app.test_client()
+
+
+def rate(call) -> float:
+    """ Calls of call() per second over DURATION seconds
+    """
+    count = 0
+    start = time.perf_counter()
+    while time.perf_counter() - start < DURATION:
+        call()
+        count += 1
+    return count / (time.perf_counter() - start)
+
+
+print("{} users".format(size))
+for memoize in (False, True):
+    User._memoize = memoize
+    one = rate(lambda: client.get("/api/v1/users/{}".format(
+        random.choice(users).id)))
+    page = rate(lambda: client.get("/api/v1/users?limit=100"))
+    to_json = rate(lambda: random.choice(users).to_json())
+    print("  memoize={:<5}  GET /users/<id> {:7.0f} req/s, GET /users?"
+          "limit=100 {:5.0f} req/s, to_json() {:8.0f} /s".format(
+              str(memoize), one, page, to_json))
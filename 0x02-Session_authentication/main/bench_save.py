@@ -0,0 +1,35 @@
+#!/usr/bin/env python3
+""" Benchmark of User.save latency against store size, rewriting the
+whole file, appending to the journal or coalescing writes
+"""
+import os
+import sys
+import tempfile
+import time
+from models.user import User
+
+SAVES = 100
+
+os.chdir(tempfile.mkdtemp())
+sizes = [int(arg) for arg in sys.argv[1:]] or [1000, 10000, 100000]
+User.load_from_file()
+count = 0
+for size in sizes:
+    User._journal = True
+    while count < size:
+        User(email="user{}@hbtn.io".format(count)).save()
+        count += 1
+    users = User.all()[:SAVES]
+
+    results = []
+    for journal, flush_batch in ((False, 0), (True, 0), (False, SAVES)):
+        User._journal = journal
+        User._flush_batch = flush_batch
+        start = time.perf_counter()
+        for user in users:
+            user.save()
+        User.flush()
+        results.append((time.perf_counter() - start) / SAVES * 1e6)
+    User._flush_batch = 0
+    print("{:>7} users: whole file {:.0f} us/save, journal {:.0f} us/save,"
+          " coalesced {:.0f} us/save".format(size, *results))
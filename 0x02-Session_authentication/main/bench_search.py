@@ -0,0 +1,33 @@
+#!/usr/bin/env python3
+""" Benchmark of User.search by email, from 1k to 1M users
+"""
+import sys
+import time
+from models.user import User
+
+User._storage.save_to_file = lambda cls: None
+SEARCHES = 1000
+
+sizes = [int(arg) for arg in sys.argv[1:]] or [1000, 10000, 100000, 1000000]
+count = 0
+for size in sizes:
+    while count < size:
+        user = User(email="user{}@hbtn.io".format(count))
+        user.save()
+        count += 1
+    emails = ["user{}@hbtn.io".format(i * (size // SEARCHES))
+              for i in range(SEARCHES)]
+
+    start = time.perf_counter()
+    for email in emails:
+        assert len(User.search({'email': email})) == 1
+    indexed = (time.perf_counter() - start) / SEARCHES * 1e6
+
+    scan_emails = emails[:10]
+    start = time.perf_counter()
+    for email in scan_emails:
+        [u for u in User.all() if u.email == email]
+    scan = (time.perf_counter() - start) / len(scan_emails) * 1e6
+
+    print("{:>8} users: indexed search {:.1f} us, full scan {:.1f} us"
+          .format(size, indexed, scan))
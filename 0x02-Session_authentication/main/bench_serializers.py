@@ -0,0 +1,38 @@
+#!/usr/bin/env python3
+""" Benchmark of User snapshot save and load time and file size for each
+serializer, at 100k and 1M users by default
+"""
+import os
+import sys
+import tempfile
+import time
+from models.engine.serializers import SERIALIZERS
+from models.user import User
+
+SIZES = [int(size) for size in sys.argv[1:]] or [100000, 1000000]
+
+os.chdir(tempfile.mkdtemp())
+for size in SIZES:
+    User.load_from_file()
+    for i in range(size):
+        user = User(id="{:036d}".format(i),
+                    created_at="2024-04-22T12:00:15",
+                    updated_at="2024-04-22T12:00:32",
+                    email="user{}@hbtn.io".format(i),
+                    _password="7a321db83885ebbe8358bc1160c803af6cc70c80aa8f")
+        User._storage.objects(User)[user.id] = user
+    print("{} users".format(size))
+    for name in SERIALIZERS:
+        User._serializer = name
+        start = time.perf_counter()
+        User.save_to_file()
+        saved = time.perf_counter() - start
+        start = time.perf_counter()
+        User.load_from_file()
+        loaded = time.perf_counter() - start
+        assert User.count() == size
+        file_path = User._storage.file_path(User)
+        print("  {:<8} save {:6.2f}s  load {:6.2f}s  {:7.1f} MB".format(
+            name, saved, loaded, os.path.getsize(file_path) / 1e6))
+        os.remove(file_path)
+    User._storage.objects(User).clear()
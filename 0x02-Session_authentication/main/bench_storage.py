@@ -0,0 +1,58 @@
+#!/usr/bin/env python3
+""" Benchmark of the JSON and SQLite storage engines on the users and
+sessions workloads
+"""
+import os
+import sys
+import tempfile
+import time
+from models.engine.json_storage import JSONStorage
+from models.engine.sqlite_storage import SQLiteStorage
+from models.user import User
+from models.user_session import UserSession
+
+COUNT = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+
+
+def timed(label: str, fn, count: int = COUNT):
+    """ Print the time per operation of fn
+    """
+    start = time.perf_counter()
+    fn()
+    print("  {:<22} {:>8.1f} us/op".format(
+        label, (time.perf_counter() - start) / count * 1e6))
+
+
+def users_workload():
+    """ Create users, then log them in by email and fetch them by ID
+    """
+    users = [User(email="user{}@hbtn.io".format(i)) for i in range(COUNT)]
+    timed("create user", lambda: [user.save() for user in users])
+    timed("search by email", lambda: [User.search({'email': user.email})
+                                      for user in users])
+    timed("get by id", lambda: [User.get(user.id) for user in users])
+    return users
+
+
+def sessions_workload(users):
+    """ Create a session per user, resolve and destroy them
+    """
+    sessions = [UserSession(user_id=user.id, session_id=str(i))
+                for i, user in enumerate(users)]
+    timed("create session", lambda: [sess.save() for sess in sessions])
+    timed("search session_id", lambda: [
+        UserSession.search({'session_id': sess.session_id})
+        for sess in sessions])
+    timed("remove session", lambda: [sess.remove() for sess in sessions])
+
+
+for name, engine, journal in (("json", JSONStorage, False),
+                              ("json + journal", JSONStorage, True),
+                              ("sqlite", SQLiteStorage, False)):
+    os.chdir(tempfile.mkdtemp())
+    for cls in (User, UserSession):
+        cls._storage = engine()
+        cls._journal = journal
+        cls.load_from_file()
+    print("{} ({} objects)".format(name, COUNT))
+    sessions_workload(users_workload())
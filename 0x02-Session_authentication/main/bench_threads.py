@@ -0,0 +1,57 @@
+#!/usr/bin/env python3
+""" Multi-threaded benchmark of the JSON store: threads log users in by
+email, fetch them by ID, update, create and remove users concurrently
+"""
+import os
+import tempfile
+import threading
+import time
+from models.user import User
+
+USERS = 1000
+OPS = 20000
+
+os.chdir(tempfile.mkdtemp())
+User._journal = True
+User.load_from_file()
+users = [User(email="user{}@hbtn.io".format(i)) for i in range(USERS)]
+for user in users:
+    user.save()
+
+
+def worker(n: int, ops: int, errors: list):
+    """ Mix of 80% searches, 15% gets and 5% saves or create/remove
+    """
+    try:
+        for i in range(ops):
+            user = users[(n * 7919 + i) % USERS]
+            if i % 40 == 0:
+                temp = User(email="temp{}@hbtn.io".format(n))
+                temp.save()
+                temp.remove()
+            elif i % 20 == 0:
+                user.save()
+            elif i % 20 < 4:
+                assert User.get(user.id) is user
+            else:
+                assert User.search({'email': user.email}) == [user]
+            if i % 500 == 0:
+                User.all()
+    except Exception as e:
+        errors.append(e)
+
+
+for count in (1, 2, 4, 8):
+    errors = []
+    threads = [threading.Thread(target=worker,
+                                args=(n, OPS // count, errors))
+               for n in range(count)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+    print("{} thread(s): {:.0f} ops/s, {} errors".format(
+        count, OPS / elapsed, len(errors)))
+    assert not errors, errors[0]
@@ -0,0 +1,33 @@
+#!/usr/bin/env python3
+""" Micro-benchmarks of timestamp parsing and formatting, and of the Base
+construction and to_json paths using them
+"""
+import timeit
+from datetime import datetime
+from models.base import TIMESTAMP_FORMAT, parse_timestamp, format_timestamp
+from models.user import User
+
+NUMBER = 100000
+stamp = "2024-04-22T12:00:15"
+now = datetime.utcnow()
+record = {"id": "42b4dbd5-b68b-4dbd-9085-fa30ffc7893f",
+          "created_at": stamp, "updated_at": stamp,
+          "email": "bob@hbtn.io", "_password": None,
+          "first_name": None, "last_name": None}
+User._memoize = False
+user = User(**record)
+
+for name, before, after in (
+        ("parse", lambda: datetime.strptime(stamp, TIMESTAMP_FORMAT),
+         lambda: parse_timestamp(stamp)),
+        ("format", lambda: now.strftime(TIMESTAMP_FORMAT),
+         lambda: format_timestamp(now))):
+    slow = timeit.timeit(before, number=NUMBER) / NUMBER * 1e9
+    fast = timeit.timeit(after, number=NUMBER) / NUMBER * 1e9
+    print("{:>7}: {:.0f} ns -> {:.0f} ns ({:.1f}x)".format(
+        name, slow, fast, slow / fast))
+
+for name, stmt in (("User(**record)", lambda: User(**record)),
+                   ("to_json()", lambda: user.to_json(True))):
+    print("{:>15}: {:.0f} ns".format(
+        name, timeit.timeit(stmt, number=NUMBER) / NUMBER * 1e9))
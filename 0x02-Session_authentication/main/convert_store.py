@@ -0,0 +1,27 @@
+#!/usr/bin/env python3
+""" Convert the .db_<Class>.json files of the current directory (or the
+given class files) to another snapshot format:
+
+    ./convert_store.py binary [.db_User.json ...]
+
+Then run the app with BASE_SERIALIZER set to that format
+"""
+import glob
+import sys
+from os import path
+from models.engine.serializers import SERIALIZERS, convert
+
+if len(sys.argv) < 2 or sys.argv[1] not in SERIALIZERS:
+    sys.exit("usage: {} {{{}}} [file ...]".format(sys.argv[0],
+                                                  ",".join(SERIALIZERS)))
+dst = sys.argv[1]
+extensions = {serializer.extension: name
+              for name, serializer in SERIALIZERS.items()}
+for src_path in sys.argv[2:] or glob.glob(".db_*.json"):
+    stem, extension = path.splitext(src_path)
+    src = extensions.get(extension[1:])
+    if src is None:
+        sys.exit("{}: unknown format".format(src_path))
+    dst_path = "{}.{}".format(stem, SERIALIZERS[dst].extension)
+    count = convert(src_path, src, dst_path, dst)
+    print("{} -> {}: {} records".format(src_path, dst_path, count))
@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+""" Stress test of the shared JSON store: N worker processes create users
+and sessions, resolve each other's sessions and log out concurrently
+"""
+import os
+import sys
+import tempfile
+from multiprocessing import Process
+
+WORKERS = int(sys.argv[1]) if len(sys.argv) > 1 else 8
+ROUNDS = int(sys.argv[2]) if len(sys.argv) > 2 else 50
+
+
+def worker(n: int):
+    """ Create ROUNDS users, each with a session, then remove half of the
+    sessions, checking that sessions of other workers are visible
+    """
+    from models.user import User
+    from models.user_session import UserSession
+
+    sessions = []
+    for i in range(ROUNDS):
+        user = User(email="w{}-{}@hbtn.io".format(n, i))
+        user.save()
+        sess = UserSession(user_id=user.id,
+                           session_id="w{}-{}".format(n, i))
+        sess.save()
+        sessions.append(sess)
+        other = UserSession.search({'session_id': "w{}-{}".format(
+            (n + 1) % WORKERS, i // 2)})
+        for found in other:
+            assert User.get(found.user_id) is not None
+    for sess in sessions[::2]:
+        sess.remove()
+
+
+def main():
+    """ Run the workers on a fresh shared store and check the totals
+    """
+    os.environ['BASE_SHARED'] = '1'
+    os.chdir(tempfile.mkdtemp())
+    from models.user import User
+    from models.user_session import UserSession
+
+    processes = [Process(target=worker, args=(n,)) for n in range(WORKERS)]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join()
+        assert process.exitcode == 0
+
+    User.load_from_file()
+    UserSession.load_from_file()
+    expected_sessions = WORKERS * (ROUNDS - (ROUNDS + 1) // 2)
+    print("users: {} (expected {})".format(User.count(), WORKERS * ROUNDS))
+    print("sessions: {} (expected {})".format(UserSession.count(),
+                                              expected_sessions))
+    assert User.count() == WORKERS * ROUNDS
+    assert UserSession.count() == expected_sessions
+
+
+if __name__ == '__main__':
+    main()
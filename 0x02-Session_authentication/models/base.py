@@ -1,40 +1,169 @@
 #!/usr/bin/env python3
 """ Base module
 """
+from base64 import urlsafe_b64decode, urlsafe_b64encode
 from datetime import datetime
-from typing import TypeVar, List, Iterable
-from os import path
+from typing import TypeVar, List, Iterable, Iterator, Tuple, Any, Callable
+from os import getenv
 import json
+from models.engine.json_storage import JSONStorage
 import uuid
 
 
 TIMESTAMP_FORMAT = "%Y-%m-%dT%H:%M:%S"
-DATA = {}
+FIELDS = {}
+
+if getenv('BASE_STORAGE', 'json') == 'sqlite':
+    from models.engine.sqlite_storage import SQLiteStorage
+    storage = SQLiteStorage(getenv('BASE_SQLITE_PATH', '.db.sqlite3'))
+else:
+    storage = JSONStorage()
+
+
+def parse_timestamp(value: str) -> datetime:
+    """ Parse a TIMESTAMP_FORMAT string, with datetime.fromisoformat for
+    the common case
+    """
+    if len(value) == 19 and value[4] == value[7] == '-' and \
+            value[10] == 'T' and value[13] == value[16] == ':':
+        try:
+            return datetime.fromisoformat(value)
+        except ValueError:
+            pass
+    return datetime.strptime(value, TIMESTAMP_FORMAT)
+
+
+def format_timestamp(value: datetime) -> str:
+    """ Format a datetime with TIMESTAMP_FORMAT, with datetime.isoformat for
+    the common case
+    """
+    if value.tzinfo is None and value.year >= 1000:
+        return value.isoformat(timespec='seconds')
+    return value.strftime(TIMESTAMP_FORMAT)
+
+
+def encode_cursor(order: str, obj: TypeVar('Base')) -> str:
+    """ Opaque pagination cursor pointing after obj in (order, ID) order
+    """
+    value = getattr(obj, order)
+    key = [order, obj.id, value]
+    if type(value) is datetime:
+        key = [order, obj.id, value.isoformat(), "datetime"]
+    data = json.dumps(key, separators=(',', ':')).encode('utf-8')
+    return urlsafe_b64encode(data).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor: str) -> Tuple[str, tuple]:
+    """ Order attribute and (value, ID) pair of a pagination cursor, or
+    ValueError if it is not one
+    """
+    try:
+        data = urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        key = json.loads(data.decode('utf-8'))
+        order, obj_id, value = key[:3]
+        if key[3:] == ["datetime"]:
+            value = datetime.fromisoformat(value)
+        elif len(key) != 3:
+            raise ValueError
+        if type(order) is not str or type(obj_id) is not str:
+            raise ValueError
+    except (ValueError, TypeError, KeyError, UnicodeError):
+        raise ValueError("invalid cursor") from None
+    return order, (value, obj_id)
+
+
+def _fields(cls) -> Tuple[str, ...]:
+    """ Names of the __slots__ attributes of a class, base classes first
+    """
+    if cls not in FIELDS:
+        names = []
+        for klass in reversed(cls.__mro__):
+            slots = klass.__dict__.get('__slots__', ())
+            if type(slots) is str:
+                slots = (slots,)
+            names.extend(name for name in slots
+                         if name not in ('__dict__', '__weakref__', '_cache'))
+        FIELDS[cls] = tuple(names)
+    return FIELDS[cls]
 
 
 class Base():
     """ Base class
+
+    Objects are stored by the engine in `_storage`: JSONStorage (one
+    .db_<Class>.json file per class, see its options) or, with
+    BASE_STORAGE=sqlite, SQLiteStorage on the BASE_SQLITE_PATH database.
+    Subclasses list in `_indexes` the attributes both engines index, and
+    in `_sorted_indexes` those range and prefix searches should use an
+    ordered index for, and iter_search() and page() can order by.
+
+    Models declare their attributes in `__slots__`, so instances carry no
+    per-object __dict__; to_json() walks the slots instead.
+
+    With `_memoize` (BASE_MEMOIZE=1, off by default), to_json() and other
+    cached() values are kept on the object until one of its attributes is
+    set or it is saved. This trades memory for the read endpoints: about
+    three times the size of a bare object once cached. Mutating an
+    attribute value in place (e.g. a list) is not seen: set the attribute
+    or save(). to_json(True), used by the storage engines, is never cached.
     """
 
+    __slots__ = ('id', 'created_at', 'updated_at', '_cache')
+
+    _storage = storage
+    _indexes: Tuple[str, ...] = ()
+    _sorted_indexes: Tuple[str, ...] = ('id', 'created_at')
+    _journal: bool = getenv('BASE_JOURNAL', '0') == '1'
+    _flush_interval: float = float(getenv('BASE_FLUSH_INTERVAL', 0))
+    _flush_batch: int = int(getenv('BASE_FLUSH_BATCH', 0))
+    _lazy_load: bool = getenv('BASE_LAZY_LOAD', '0') == '1'
+    _stream_load: bool = getenv('BASE_STREAM_LOAD', '0') == '1'
+    _shared: bool = getenv('BASE_SHARED', '0') == '1'
+    _fsync: str = getenv('BASE_FSYNC', 'never')
+    _serializer: str = getenv('BASE_SERIALIZER', 'json')
+    _memoize: bool = getenv('BASE_MEMOIZE', '0') == '1'
+
     def __init__(self, *args: list, **kwargs: dict):
         """ Initialize a Base instance
         """
-        s_class = str(self.__class__.__name__)
-        if DATA.get(s_class) is None:
-            DATA[s_class] = {}
-
         self.id = kwargs.get('id', str(uuid.uuid4()))
         if kwargs.get('created_at') is not None:
-            self.created_at = datetime.strptime(kwargs.get('created_at'),
-                                                TIMESTAMP_FORMAT)
+            self.created_at = parse_timestamp(kwargs.get('created_at'))
         else:
             self.created_at = datetime.utcnow()
         if kwargs.get('updated_at') is not None:
-            self.updated_at = datetime.strptime(kwargs.get('updated_at'),
-                                                TIMESTAMP_FORMAT)
+            self.updated_at = parse_timestamp(kwargs.get('updated_at'))
         else:
             self.updated_at = datetime.utcnow()
 
+    def __setattr__(self, name: str, value: Any):
+        """ Set an attribute and drop the cached values, after the write so
+        a concurrent to_json() cannot cache the old value
+        """
+        object.__setattr__(self, name, value)
+        if name != '_cache':
+            object.__setattr__(self, '_cache', None)
+
+    def __delattr__(self, name: str):
+        """ Delete an attribute and drop the cached values
+        """
+        object.__delattr__(self, name)
+        object.__setattr__(self, '_cache', None)
+
+    def cached(self, key: Any, compute: Callable[[], Any]) -> Any:
+        """ Value of compute(), kept under key until an attribute is set or
+        the object is saved
+        """
+        if not self._memoize:
+            return compute()
+        cache = getattr(self, '_cache', None)
+        if cache is None:
+            cache = {}
+            object.__setattr__(self, '_cache', cache)
+        if key not in cache:
+            cache[key] = compute()
+        return cache[key]
+
     def __eq__(self, other: TypeVar('Base')) -> bool:
         """ Equality
         """
@@ -47,12 +176,24 @@ class Base():
     def to_json(self, for_serialization: bool = False) -> dict:
         """ Convert the object a JSON dictionary
         """
+        if for_serialization:
+            return self._to_json(True)
+        return dict(self.cached(('to_json', for_serialization),
+                                lambda: self._to_json(for_serialization)))
+
+    def _to_json(self, for_serialization: bool) -> dict:
+        """ Build the JSON dictionary of the object
+        """
         result = {}
-        for key, value in self.__dict__.items():
+        items = [(key, getattr(self, key)) for key in _fields(type(self))
+                 if hasattr(self, key)]
+        if hasattr(self, '__dict__'):
+            items.extend(self.__dict__.items())
+        for key, value in items:
             if not for_serialization and key[0] == '_':
                 continue
             if type(value) is datetime:
-                result[key] = value.strftime(TIMESTAMP_FORMAT)
+                result[key] = format_timestamp(value)
             else:
                 result[key] = value
         return result
@@ -61,78 +202,105 @@ class Base():
     def load_from_file(cls):
         """ Load all objects from file
         """
-        s_class = cls.__name__
-        file_path = ".db_{}.json".format(s_class)
-        DATA[s_class] = {}
-        if not path.exists(file_path):
-            return
-
-        with open(file_path, 'r') as f:
-            objs_json = json.load(f)
-            for obj_id, obj_json in objs_json.items():
-                DATA[s_class][obj_id] = cls(**obj_json)
+        cls._storage.load(cls)
 
     @classmethod
     def save_to_file(cls):
         """ Save all objects to file
         """
-        s_class = cls.__name__
-        file_path = ".db_{}.json".format(s_class)
-        objs_json = {}
-        for obj_id, obj in DATA[s_class].items():
-            objs_json[obj_id] = obj.to_json(True)
+        cls._storage.save_to_file(cls)
 
-        with open(file_path, 'w') as f:
-            json.dump(objs_json, f)
+    @classmethod
+    def flush(cls):
+        """ Write changes the storage has deferred
+        """
+        cls._storage.flush(cls)
 
     def save(self):
         """ Save current object
         """
-        s_class = self.__class__.__name__
         self.updated_at = datetime.utcnow()
-        DATA[s_class][self.id] = self
-        self.__class__.save_to_file()
+        self._storage.save(self)
 
     def remove(self):
         """ Remove object
         """
-        s_class = self.__class__.__name__
-        if DATA[s_class].get(self.id) is not None:
-            del DATA[s_class][self.id]
-            self.__class__.save_to_file()
+        self._storage.remove(self)
+
+    @classmethod
+    def version(cls) -> Tuple[str, datetime]:
+        """ Token that changes whenever objects are saved or removed, and
+        the time of the last change (None if unknown)
+        """
+        return cls._storage.version(cls)
 
     @classmethod
     def count(cls) -> int:
         """ Count all objects
         """
-        s_class = cls.__name__
-        return len(DATA[s_class].keys())
+        return cls._storage.count(cls)
 
     @classmethod
     def all(cls) -> Iterable[TypeVar('Base')]:
         """ Return all objects
         """
-        return cls.search()
+        return cls._storage.all(cls)
 
     @classmethod
     def get(cls, id: str) -> TypeVar('Base'):
         """ Return one object by ID
         """
-        s_class = cls.__name__
-        return DATA[s_class].get(id)
+        return cls._storage.get(cls, id)
 
     @classmethod
     def search(cls, attributes: dict = {}) -> List[TypeVar('Base')]:
-        """ Search all objects with matching attributes
+        """ Search all objects with matching attributes: equal values, or
+        Range, Prefix and In predicates from models.query
+        """
+        return cls._storage.search(cls, attributes)
+
+    @classmethod
+    def iter_search(cls, attributes: dict = {}, order: str = 'id',
+                    chunk_size: int = 1000) -> Iterator[TypeVar('Base')]:
+        """ Iterate over the objects with matching attributes in (order,
+        ID) order, fetching chunk_size of them at a time
         """
-        s_class = cls.__name__
+        after = None
+        while True:
+            objs = cls._storage.page(cls, attributes, order, after,
+                                     chunk_size)
+            yield from objs
+            if len(objs) < chunk_size:
+                return
+            after = (getattr(objs[-1], order), objs[-1].id)
 
-        def _search(obj):
-            if len(attributes) == 0:
-                return True
-            for k, v in attributes.items():
-                if (getattr(obj, k) != v):
-                    return False
-            return True
+    @classmethod
+    def iter_all(cls, order: str = 'id',
+                 chunk_size: int = 1000) -> Iterator[TypeVar('Base')]:
+        """ Iterate over all objects in (order, ID) order
+        """
+        return cls.iter_search({}, order, chunk_size)
 
-        return list(filter(_search, DATA[s_class].values()))
+    @classmethod
+    def page(cls, attributes: dict = {}, limit: int = 100,
+             cursor: str = None,
+             order: str = 'id') -> Tuple[List[TypeVar('Base')], str]:
+        """ One page of the objects with matching attributes in (order, ID)
+        order, starting after cursor, and the cursor of the next page (None
+        on the last one). The order is stable while objects are added or
+        removed between pages
+        """
+        if limit < 1:
+            raise ValueError("limit must be positive")
+        after = None
+        if cursor is not None:
+            cursor_order, after = decode_cursor(cursor)
+            if cursor_order != order:
+                raise ValueError("cursor of another order")
+            timestamp = order in ('created_at', 'updated_at')
+            if type(after[0]) is not (datetime if timestamp else str):
+                raise ValueError("invalid cursor")
+        objs = cls._storage.page(cls, attributes, order, after, limit + 1)
+        if len(objs) > limit:
+            return objs[:limit], encode_cursor(order, objs[limit - 1])
+        return objs, None
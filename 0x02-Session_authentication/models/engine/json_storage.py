@@ -0,0 +1,848 @@
+#!/usr/bin/env python3
+""" JSON file storage engine
+"""
+from bisect import bisect_left, bisect_right
+from contextlib import contextmanager
+from datetime import datetime
+from typing import TypeVar, List, BinaryIO, Tuple, Callable
+from os import getenv, path
+import atexit
+import json
+import os
+import threading
+import time
+import uuid
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+from models.engine.serializers import get_serializer
+from models.query import Range, Prefix, In, matches, matches_all, slices
+
+
+JOURNAL_COMPACT_EVERY = int(getenv('BASE_JOURNAL_COMPACT_EVERY', 1000))
+FSYNC_POLICIES = ('always', 'batched', 'never')
+FSYNC_INTERVAL = float(getenv('BASE_FSYNC_INTERVAL', 1))
+
+
+def write_atomic(file_path: str, write: Callable[[BinaryIO], None],
+                 fsync: bool = False):
+    """ Write a file through write(f) on a temporary file renamed over it,
+    so readers and crashes only ever see the old or the new content. With
+    fsync, the data and the rename are flushed to disk first
+    """
+    tmp_path = "{}.tmp.{}.{}".format(file_path, os.getpid(),
+                                     threading.get_ident())
+    try:
+        with open(tmp_path, 'wb') as f:
+            write(f)
+            f.flush()
+            if fsync:
+                os.fsync(f.fileno())
+        os.replace(tmp_path, file_path)
+    except BaseException:
+        if path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    if fsync and hasattr(os, 'O_DIRECTORY'):
+        dir_fd = os.open(path.dirname(path.abspath(file_path)),
+                         os.O_RDONLY | os.O_DIRECTORY)
+        try:
+            os.fsync(dir_fd)
+        finally:
+            os.close(dir_fd)
+
+
+class RWLock():
+    """ Readers-writer lock: many readers or one writer, writers first.
+    The writing thread may take the lock again, to read or write; readers
+    must not nest
+    """
+
+    def __init__(self):
+        """ Initialize an unlocked lock
+        """
+        self.cond = threading.Condition(threading.Lock())
+        self.readers = 0
+        self.writer = None
+        self.write_depth = 0
+        self.waiting_writers = 0
+
+    def acquire(self, exclusive: bool = False):
+        """ Take the lock for reading, or for writing with exclusive
+        """
+        me = threading.get_ident()
+        with self.cond:
+            if self.writer == me:
+                self.write_depth += 1
+            elif exclusive:
+                self.waiting_writers += 1
+                while self.writer is not None or self.readers:
+                    self.cond.wait()
+                self.waiting_writers -= 1
+                self.writer = me
+                self.write_depth = 1
+            else:
+                while self.writer is not None or self.waiting_writers:
+                    self.cond.wait()
+                self.readers += 1
+
+    def release(self):
+        """ Release one acquisition of the lock
+        """
+        with self.cond:
+            if self.writer == threading.get_ident():
+                self.write_depth -= 1
+                if self.write_depth == 0:
+                    self.writer = None
+                    self.cond.notify_all()
+                return
+            self.readers -= 1
+            if self.readers == 0 and self.waiting_writers:
+                self.cond.notify_all()
+
+
+class JSONStorage():
+    """ Keeps every object in memory, by class name and ID, and persists each
+    class to a snapshot file, .db_<Class>.json by default
+
+    Classes list in `_indexes` the attributes to keep a hash index on:
+    search() on them is a dict lookup instead of a scan. `_sorted_indexes`
+    attributes get a sorted list of values, built on first use, for Range,
+    Prefix and In predicates (see models.query) and for page(), which
+    walks one from a (value, ID) keyset cursor. Indexes follow the values
+    objects had at their last save().
+
+    With `_journal` (BASE_JOURNAL=1), save() and remove() append one record
+    to .db_<Class>.journal instead of rewriting .db_<Class>.json; every
+    JOURNAL_COMPACT_EVERY records a background thread folds the journal
+    into a new snapshot. A record torn by a crash is cut off the journal
+    when it is loaded.
+
+    Otherwise, with `_flush_interval` (BASE_FLUSH_INTERVAL, in seconds) or
+    `_flush_batch` (BASE_FLUSH_BATCH, in changes) set, save() and remove()
+    only mark the class dirty and the file is rewritten once per interval
+    or batch, by flush(), or at exit.
+
+    `_serializer` (BASE_SERIALIZER) picks the snapshot format, see
+    models.engine.serializers: "json" (.db_<Class>.json, the default),
+    "pickle" (.db_<Class>.pickle) or "binary" (.db_<Class>.bin). Journals
+    stay JSON lines. main/convert_store.py converts existing files.
+
+    The class file is read with json.load, or parsed incrementally with
+    `_stream_load` (BASE_STREAM_LOAD=1): slower, but the whole document is
+    never held next to the objects. With `_lazy_load` (BASE_LAZY_LOAD=1),
+    load() parses incrementally and keeps the raw records (JSON text for
+    the json format) and only builds an object on its first get(); search()
+    and all() build the rest.
+
+    Class files are replaced atomically (see write_atomic). `_fsync`
+    (BASE_FSYNC) sets when snapshots and journal appends are flushed to
+    disk: "always", "batched" (at most once per BASE_FSYNC_INTERVAL
+    seconds: a write made sooner is flushed with the class files at the end
+    of the interval, so that much data is at risk on a power loss) or
+    "never" (the default, leaving it to the OS).
+
+    Each class has a RWLock: get(), search() and count() run concurrently,
+    while save(), remove() and loads get exclusive access, so threads of a
+    threaded server never see a class change under them.
+
+    With `_shared` (BASE_SHARED=1), several processes (e.g. pre-forked
+    server workers) can use the same files: every operation holds an
+    exclusive flock on .db_<Class>.lock and first reloads the class if
+    another process changed its files since (by inode, mtime and size; a
+    journal that only grew is replayed from where it was left). Changes are
+    written immediately and compaction is done in the foreground, under the
+    lock.
+    """
+
+    def __init__(self):
+        """ Initialize an empty storage
+        """
+        self.data = {}
+        self.lazy = {}
+        self.indexes = {}
+        self.sorted_indexes = {}
+        self.indexed_values = {}
+        self.journals = {}
+        self.dirty = {}
+        self.dirty_lock = threading.Lock()
+        self.stamps = {}
+        self.journal_offsets = {}
+        self.locks = {}
+        self.lock_depths = {}
+        self.locks_lock = threading.Lock()
+        self.last_fsync = {}
+        self.fsync_timers = {}
+        self.token = uuid.uuid4().hex
+        self.versions = {}
+        atexit.register(self.flush_all)
+
+    def objects(self, cls) -> dict:
+        """ Loaded objects of a class by ID
+        """
+        s_class = cls.__name__
+        if self.data.get(s_class) is None:
+            self.data[s_class] = {}
+            self.lazy[s_class] = {}
+            self._index_reset(cls)
+        return self.data[s_class]
+
+    @staticmethod
+    def _index_attrs(cls) -> Tuple[str, ...]:
+        """ Attributes of a class with a hash or a sorted index
+        """
+        return cls._indexes + tuple(attr for attr in cls._sorted_indexes
+                                    if attr not in cls._indexes)
+
+    def _index_add(self, obj: TypeVar('Base')):
+        """ Add an object to the indexes of its class
+        """
+        cls = obj.__class__
+        s_class = cls.__name__
+        attrs = self._index_attrs(cls)
+        values = tuple(getattr(obj, attr, None) for attr in attrs)
+        for attr, value in zip(attrs, values):
+            if attr in cls._indexes:
+                try:
+                    self.indexes[s_class][attr].setdefault(
+                        value, {})[obj.id] = obj
+                except TypeError:
+                    pass
+            index = self.sorted_indexes[s_class].get(attr)
+            if index and value is not None:
+                keys = index[0]
+                try:
+                    start = bisect_left(keys, value)
+                    stop = bisect_right(keys, value, start)
+                except TypeError:
+                    self.sorted_indexes[s_class][attr] = False
+                    continue
+                pos = bisect_right(index[1], obj.id, start, stop)
+                keys.insert(pos, value)
+                index[1].insert(pos, obj.id)
+        self.indexed_values[s_class][obj.id] = values
+
+    def _index_discard(self, cls, obj_id: str):
+        """ Remove an object ID from the indexes of a class
+        """
+        s_class = cls.__name__
+        values = self.indexed_values[s_class].pop(obj_id, None)
+        if values is None:
+            return
+        for attr, value in zip(self._index_attrs(cls), values):
+            index = self.sorted_indexes[s_class].get(attr)
+            if index and value is not None:
+                keys, ids = index
+                start = bisect_left(keys, value)
+                stop = bisect_right(keys, value, start)
+                pos = bisect_left(ids, obj_id, start, stop)
+                if pos < stop and ids[pos] == obj_id:
+                    del keys[pos]
+                    del ids[pos]
+            if attr not in cls._indexes:
+                continue
+            try:
+                bucket = self.indexes[s_class][attr].get(value)
+            except TypeError:
+                continue
+            if bucket is not None:
+                bucket.pop(obj_id, None)
+                if len(bucket) == 0:
+                    del self.indexes[s_class][attr][value]
+
+    def _index_reset(self, cls):
+        """ Clear the indexes of a class; sorted indexes are rebuilt on
+        their next use
+        """
+        s_class = cls.__name__
+        self.indexes[s_class] = {attr: {} for attr in cls._indexes}
+        self.sorted_indexes[s_class] = {attr: None
+                                        for attr in cls._sorted_indexes}
+        self.indexed_values[s_class] = {}
+
+    def _sorted_index(self, cls, attr: str) -> Tuple[list, list]:
+        """ Sorted values of an attribute (None left out) and the matching
+        object IDs, ordered by (value, ID), or None if the values cannot be
+        ordered
+        """
+        indexes = self.sorted_indexes[cls.__name__]
+        if indexes.get(attr) is None:
+            pos = self._index_attrs(cls).index(attr)
+            pairs = [(values[pos], obj_id) for obj_id, values in
+                     self.indexed_values[cls.__name__].items()]
+            try:
+                pairs = sorted(pair for pair in pairs if pair[0] is not None)
+            except TypeError:
+                indexes[attr] = False
+                return None
+            indexes[attr] = ([pair[0] for pair in pairs],
+                             [pair[1] for pair in pairs])
+        return indexes[attr] or None
+
+    def plan(self, cls, attr: str, condition) -> Tuple[int, Callable]:
+        """ Best index for one search condition: the number of candidates
+        it yields and a function returning them, or None to scan
+        """
+        s_class = cls.__name__
+        try:
+            if attr in cls._indexes and not isinstance(condition, Range) \
+                    and not isinstance(condition, Prefix):
+                index = self.indexes[s_class][attr]
+                if isinstance(condition, In):
+                    buckets = [index[value] for value in set(condition.values)
+                               if value in index]
+                else:
+                    buckets = [index.get(condition, {})]
+                return (sum(map(len, buckets)),
+                        lambda: [obj for bucket in buckets
+                                 for obj in bucket.values()])
+            if attr in cls._sorted_indexes:
+                index = self._sorted_index(cls, attr)
+                if index is None:
+                    return None
+                found = slices(condition, index[0])
+                objs = self.data[s_class]
+                return (sum(stop - start for start, stop in found),
+                        lambda: [objs[obj_id] for start, stop in found
+                                 for obj_id in index[1][start:stop]])
+        except TypeError:
+            pass
+        return None
+
+    def _journal_state(self, cls) -> dict:
+        """ Journal file handle, record count and lock of a class
+        """
+        s_class = cls.__name__
+        if self.journals.get(s_class) is None:
+            self.journals.setdefault(s_class, {'file': None, 'count': 0,
+                                               'compactor': None,
+                                               'lock': threading.Lock()})
+        return self.journals[s_class]
+
+    def file_path(self, cls, extension: str = None) -> str:
+        """ Path of a storage file of a class, by default its snapshot
+        """
+        if extension is None:
+            extension = get_serializer(cls._serializer).extension
+        return ".db_{}.{}".format(cls.__name__, extension)
+
+    @contextmanager
+    def locked(self, cls, exclusive: bool = False):
+        """ Hold the read (or, with exclusive, write) lock of a class and,
+        for shared classes, its inter-process lock. Re-entrant within a
+        thread
+        """
+        s_class = cls.__name__
+        with self.locks_lock:
+            if s_class not in self.locks:
+                self.locks[s_class] = RWLock()
+                self.lock_depths[s_class] = [None, 0]
+        rwlock = self.locks[s_class]
+        exclusive = exclusive or cls._shared
+        rwlock.acquire(exclusive)
+        if not exclusive and self.lazy.get(s_class):
+            rwlock.release()
+            rwlock.acquire(True)
+        try:
+            if not cls._shared:
+                yield
+                return
+            if fcntl is None:
+                raise OSError("shared storage needs fcntl.flock")
+            depth = self.lock_depths[s_class]
+            if depth[1] == 0:
+                depth[0] = open(self.file_path(cls, "lock"), 'a')
+                fcntl.flock(depth[0].fileno(), fcntl.LOCK_EX)
+            depth[1] += 1
+            try:
+                yield
+            finally:
+                depth[1] -= 1
+                if depth[1] == 0:
+                    fcntl.flock(depth[0].fileno(), fcntl.LOCK_UN)
+                    depth[0].close()
+                    depth[0] = None
+        finally:
+            rwlock.release()
+
+    def _stamp(self, cls) -> tuple:
+        """ Identity of the files of a class: (inode, mtime, size) of the
+        snapshot and set-aside journal, (inode, size) of the journal
+        """
+        stamp = []
+        for extension in (None, "journal.compacting", "journal"):
+            try:
+                st = os.stat(self.file_path(cls, extension))
+            except FileNotFoundError:
+                stamp.append(None)
+                continue
+            if extension == "journal":
+                stamp.append((st.st_ino, st.st_size))
+            else:
+                stamp.append((st.st_ino, st.st_mtime_ns, st.st_size))
+        return tuple(stamp)
+
+    def _remember_files(self, cls):
+        """ Record the current files of a class as the loaded state
+        """
+        s_class = cls.__name__
+        stamp = self._stamp(cls)
+        self.stamps[s_class] = stamp
+        self.journal_offsets[s_class] = stamp[2][1] if stamp[2] else 0
+
+    def refresh(self, cls):
+        """ Reload a shared class if another process changed its files
+        """
+        if not cls._shared:
+            return
+        s_class = cls.__name__
+        old = self.stamps.get(s_class)
+        stamp = self._stamp(cls)
+        if old == stamp and s_class in self.data:
+            return
+        if old is not None and old[:2] == stamp[:2] and old[2] and \
+                stamp[2] and old[2][0] == stamp[2][0] and \
+                stamp[2][1] >= old[2][1] and s_class in self.data:
+            file_path = self.file_path(cls, "journal")
+            count, offset = self.replay_journal(
+                cls, file_path, self.journal_offsets[s_class])
+            self.truncate_torn(file_path, offset)
+            self._journal_state(cls)['count'] += count
+            self.journal_offsets[s_class] = offset
+            if count:
+                self._changed(cls)
+            self.stamps[s_class] = stamp[:2] + ((stamp[2][0], offset),)
+            return
+        self._load(cls)
+
+    def load(self, cls):
+        """ Load all objects of a class from file
+        """
+        with self.locked(cls, True):
+            self._load(cls)
+
+    def _load(self, cls):
+        """ Load all objects of a class from file, with its lock held
+        """
+        s_class = cls.__name__
+        file_path = self.file_path(cls)
+        self.data[s_class] = {}
+        self.lazy[s_class] = {}
+        self._index_reset(cls)
+        if path.exists(file_path):
+            serializer = get_serializer(cls._serializer)
+            with open(file_path, 'rb') as f:
+                if cls._lazy_load:
+                    self.lazy[s_class].update(serializer.iter_raw_records(f))
+                else:
+                    for obj_id, obj_json in serializer.iter_records(
+                            f, cls._stream_load):
+                        obj = cls(**obj_json)
+                        self.data[s_class][obj_id] = obj
+                        self._index_add(obj)
+
+        replayed = 0
+        for extension in ("journal.compacting", "journal"):
+            file_path = self.file_path(cls, extension)
+            count, offset = self.replay_journal(cls, file_path)
+            self.truncate_torn(file_path, offset)
+            replayed += count
+        self._journal_state(cls)['count'] = replayed
+        self._remember_files(cls)
+        self._changed(cls)
+
+    @staticmethod
+    def truncate_torn(file_path: str, offset: int):
+        """ Cut a journal after its last complete record, dropping what a
+        crash left half-written so new records are not appended onto it
+        """
+        if path.exists(file_path) and path.getsize(file_path) > offset:
+            os.truncate(file_path, offset)
+
+    def replay_journal(self, cls, file_path: str,
+                       offset: int = 0) -> Tuple[int, int]:
+        """ Apply the records of a journal file from a byte offset, return
+        how many there were and the offset after the last complete one
+        """
+        s_class = cls.__name__
+        if not path.exists(file_path):
+            return 0, 0
+        count = 0
+        with open(file_path, 'rb') as f:
+            f.seek(offset)
+            for line in iter(f.readline, b""):
+                try:
+                    if not line.endswith(b"\n"):
+                        raise ValueError("torn record")
+                    record = json.loads(line)
+                except ValueError:
+                    break
+                offset += len(line)
+                count += 1
+                if record.get('op') == 'save':
+                    obj = cls(**record['obj'])
+                    self._index_discard(cls, obj.id)
+                    self.lazy[s_class].pop(obj.id, None)
+                    self.data[s_class][obj.id] = obj
+                    self._index_add(obj)
+                elif record.get('op') == 'remove':
+                    self.lazy[s_class].pop(record['id'], None)
+                    self.data[s_class].pop(record['id'], None)
+                    self._index_discard(cls, record['id'])
+        return count, offset
+
+    def materialize(self, cls, obj_id: str = None):
+        """ Build lazily loaded objects: the one with obj_id, or all of them
+        """
+        s_class = cls.__name__
+        pending = self.lazy.get(s_class)
+        if not pending:
+            return
+        if obj_id is not None:
+            ids = [obj_id] if obj_id in pending else []
+        else:
+            ids = list(pending)
+        serializer = get_serializer(cls._serializer)
+        for pending_id in ids:
+            raw = pending.pop(pending_id, None)
+            if raw is None:
+                continue
+            if pending_id not in self.data[s_class]:
+                obj = cls(**serializer.load_record(raw))
+                self.data[s_class][pending_id] = obj
+                self._index_add(obj)
+
+    def snapshot(self, cls) -> dict:
+        """ Objects of a class by ID, with the records of objects not
+        loaded yet
+        """
+        s_class = cls.__name__
+        objs = dict(self.lazy.get(s_class, {}))
+        objs.update(self.objects(cls))
+        return objs
+
+    def save_to_file(self, cls):
+        """ Save all objects of a class to file
+        """
+        with self.locked(cls, True):
+            self.write_snapshot(cls, self.snapshot(cls))
+
+    def write_snapshot(self, cls, objs: dict):
+        """ Write objects (or records of objects not loaded yet) to the
+        class file
+        """
+        serializer = get_serializer(cls._serializer)
+        objs_json = {}
+        for obj_id, obj in objs.items():
+            if isinstance(obj, (dict, str)):
+                objs_json[obj_id] = serializer.load_record(obj)
+            else:
+                objs_json[obj_id] = obj.to_json(True)
+
+        write_atomic(self.file_path(cls),
+                     lambda f: serializer.dump(objs_json, f),
+                     self.should_fsync(cls))
+
+    def should_fsync(self, cls) -> bool:
+        """ Whether the write being made to a class file must be flushed to
+        disk, following the class fsync policy
+        """
+        if cls._fsync not in FSYNC_POLICIES:
+            raise ValueError("fsync policy must be one of {}"
+                             .format(FSYNC_POLICIES))
+        if cls._fsync != 'batched':
+            return cls._fsync == 'always'
+        s_class = cls.__name__
+        now = time.monotonic()
+        with self.locks_lock:
+            wait = self.last_fsync.get(s_class, 0) + FSYNC_INTERVAL - now
+            if wait <= 0:
+                self.last_fsync[s_class] = now
+                return True
+            if self.fsync_timers.get(s_class) is None:
+                self.fsync_timers[s_class] = threading.Timer(
+                    wait, self.fsync_files, args=(cls,))
+                self.fsync_timers[s_class].daemon = True
+                self.fsync_timers[s_class].start()
+        return False
+
+    def fsync_files(self, cls):
+        """ Flush the class files and their directory to disk, for the
+        writes the "batched" policy let through without it
+        """
+        with self.locks_lock:
+            self.fsync_timers.pop(cls.__name__, None)
+            self.last_fsync[cls.__name__] = time.monotonic()
+        for extension in (None, "journal.compacting", "journal"):
+            try:
+                fd = os.open(self.file_path(cls, extension), os.O_RDONLY)
+            except FileNotFoundError:
+                continue
+            try:
+                os.fsync(fd)
+            finally:
+                os.close(fd)
+        if hasattr(os, 'O_DIRECTORY'):
+            dir_fd = os.open(path.dirname(path.abspath(self.file_path(cls))),
+                             os.O_RDONLY | os.O_DIRECTORY)
+            try:
+                os.fsync(dir_fd)
+            finally:
+                os.close(dir_fd)
+
+    def append_to_journal(self, cls, op: str, obj: TypeVar('Base')):
+        """ Append one record ("save" or "remove" of obj) to the class
+        journal, and start a compaction every JOURNAL_COMPACT_EVERY records
+        """
+        state = self._journal_state(cls)
+        if op == 'save':
+            record = {'op': op, 'obj': obj.to_json(True)}
+        else:
+            record = {'op': op, 'id': obj.id}
+        line = json.dumps(record) + "\n"
+        with state['lock']:
+            if state['file'] is None:
+                state['file'] = open(self.file_path(cls, "journal"), 'a')
+            state['file'].write(line)
+            state['file'].flush()
+            if self.should_fsync(cls):
+                os.fsync(state['file'].fileno())
+            if cls._shared:
+                state['file'].close()
+                state['file'] = None
+            state['count'] += 1
+            if state['count'] < JOURNAL_COMPACT_EVERY or \
+                    state['compactor'] is not None:
+                return
+            if cls._shared:
+                state['compactor'] = threading.current_thread()
+            else:
+                state['compactor'] = threading.Thread(target=self.compact,
+                                                      args=(cls,))
+                state['compactor'].start()
+        if cls._shared:
+            self.compact(cls)
+
+    def compact(self, cls):
+        """ Fold the journal of a class into a new snapshot of its file
+
+        The journal is set aside under the lock, so saves keep appending to
+        a fresh one while the snapshot is written. Until the snapshot is in
+        place, load() replays the set-aside journal as well.
+        """
+        state = self._journal_state(cls)
+        compacting = self.file_path(cls, "journal.compacting")
+        try:
+            with state['lock']:
+                if state['file'] is not None:
+                    state['file'].close()
+                    state['file'] = None
+                journal = self.file_path(cls, "journal")
+                if path.exists(journal) and path.exists(compacting):
+                    with open(journal, 'r') as src, \
+                            open(compacting, 'a') as dst:
+                        dst.write(src.read())
+                    os.remove(journal)
+                elif path.exists(journal):
+                    os.replace(journal, compacting)
+                state['count'] = 0
+                objs = self.snapshot(cls)
+            self.write_snapshot(cls, objs)
+            if path.exists(compacting):
+                os.remove(compacting)
+        finally:
+            state['compactor'] = None
+
+    def persist(self, cls, op: str, obj: TypeVar('Base')):
+        """ Write a change ("save" or "remove" of obj) of a class to disk
+        following its persistence mode
+        """
+        if cls._journal:
+            self.append_to_journal(cls, op, obj)
+        elif not cls._shared and \
+                (cls._flush_interval > 0 or cls._flush_batch > 0):
+            self.mark_dirty(cls)
+        else:
+            self.save_to_file(cls)
+        if cls._shared:
+            self._remember_files(cls)
+
+    def mark_dirty(self, cls):
+        """ Record an unsaved change: flush now if the batch is full, or
+        schedule a flush at the end of the interval
+        """
+        s_class = cls.__name__
+        with self.dirty_lock:
+            state = self.dirty.setdefault(s_class, {'cls': cls, 'pending': 0,
+                                                    'timer': None})
+            state['pending'] += 1
+            full = 0 < cls._flush_batch <= state['pending']
+            if not full and cls._flush_interval > 0 and \
+                    state['timer'] is None:
+                state['timer'] = threading.Timer(cls._flush_interval,
+                                                 self.flush, args=(cls,))
+                state['timer'].daemon = True
+                state['timer'].start()
+        if full:
+            self.flush(cls)
+
+    def flush(self, cls):
+        """ Write the class file if it has unsaved changes
+        """
+        s_class = cls.__name__
+        with self.dirty_lock:
+            state = self.dirty.pop(s_class, None)
+        if state is None:
+            return
+        if state['timer'] is not None:
+            state['timer'].cancel()
+        self.save_to_file(cls)
+
+    def flush_all(self):
+        """ Write the file of every class with unsaved changes
+        """
+        with self.dirty_lock:
+            classes = [state['cls'] for state in self.dirty.values()]
+        for cls in classes:
+            self.flush(cls)
+
+    def save(self, obj: TypeVar('Base')):
+        """ Store an object and persist the change
+        """
+        cls = obj.__class__
+        s_class = cls.__name__
+        with self.locked(cls, True):
+            self.refresh(cls)
+            objs = self.objects(cls)
+            self.lazy[s_class].pop(obj.id, None)
+            objs[obj.id] = obj
+            self._index_discard(cls, obj.id)
+            self._index_add(obj)
+            self.persist(cls, 'save', obj)
+            self._changed(cls)
+
+    def remove(self, obj: TypeVar('Base')):
+        """ Delete an object and persist the change
+        """
+        cls = obj.__class__
+        with self.locked(cls, True):
+            self.refresh(cls)
+            objs = self.objects(cls)
+            self.materialize(cls, obj.id)
+            if objs.get(obj.id) is not None:
+                del objs[obj.id]
+                self._index_discard(cls, obj.id)
+                self.persist(cls, 'remove', obj)
+                self._changed(cls)
+
+    def _changed(self, cls):
+        """ Count a change of the objects of a class, with its time
+        """
+        version = self.versions.setdefault(cls.__name__, [0, None])
+        version[0] += 1
+        version[1] = datetime.utcnow()
+
+    def version(self, cls) -> Tuple[str, datetime]:
+        """ Token changing whenever the objects of a class change, unique
+        to this process, and the time of the last change (or None)
+        """
+        with self.locked(cls):
+            self.refresh(cls)
+            count, changed_at = self.versions.get(cls.__name__, [0, None])
+            return "{}-{}-{}".format(self.token, os.getpid(),
+                                     count), changed_at
+
+    def count(self, cls) -> int:
+        """ Count all objects of a class
+        """
+        s_class = cls.__name__
+        with self.locked(cls):
+            self.refresh(cls)
+            return len(self.objects(cls)) + len(self.lazy[s_class])
+
+    def all(self, cls) -> List[TypeVar('Base')]:
+        """ Return all objects of a class
+        """
+        return self.search(cls)
+
+    def get(self, cls, id: str) -> TypeVar('Base'):
+        """ Return one object of a class by ID
+        """
+        with self.locked(cls):
+            self.refresh(cls)
+            objs = self.objects(cls)
+            self.materialize(cls, id)
+            return objs.get(id)
+
+    def search(self, cls, attributes: dict = {}) -> List[TypeVar('Base')]:
+        """ Search all objects of a class with matching attributes (values
+        or models.query predicates), starting from the index that yields
+        the fewest candidates
+        """
+        with self.locked(cls):
+            self.refresh(cls)
+            objs = self.objects(cls)
+            self.materialize(cls)
+
+            def _search(obj):
+                for k, v in attributes.items():
+                    if not matches(v, getattr(obj, k)):
+                        return False
+                return True
+
+            best = None
+            for k, v in attributes.items():
+                plan = self.plan(cls, k, v)
+                if plan is not None and (best is None or plan[0] < best[0]):
+                    best = plan
+            candidates = objs.values() if best is None else best[1]()
+
+            return list(filter(_search, candidates))
+
+    def page(self, cls, attributes: dict = {}, order: str = 'id',
+             after: tuple = None, limit: int = 100) -> List[TypeVar('Base')]:
+        """ Up to limit objects of a class matching attributes, ordered by
+        (order attribute, ID) and following after, a (value, ID) pair.
+        order must be in the class `_sorted_indexes`; objects without a
+        value for it are left out
+        """
+        with self.locked(cls):
+            self.refresh(cls)
+            objs = self.objects(cls)
+            self.materialize(cls)
+            index = self._sorted_index(cls, order) \
+                if order in cls._sorted_indexes else None
+            if index is None:
+                raise ValueError("{} cannot be ordered by {}"
+                                 .format(cls.__name__, order))
+            keys, ids = index
+            start = 0
+            if after is not None:
+                start = bisect_left(keys, after[0])
+                stop = bisect_right(keys, after[0], start)
+                start = bisect_right(ids, after[1], start, stop)
+
+            best = None
+            for k, v in attributes.items():
+                plan = self.plan(cls, k, v)
+                if plan is not None and (best is None or plan[0] < best[0]):
+                    best = plan
+            if best is not None and best[0] < len(keys) - start:
+                pos = self._index_attrs(cls).index(order)
+                values = self.indexed_values[cls.__name__]
+                found = sorted(
+                    ((values[obj.id][pos], obj.id), obj)
+                    for obj in best[1]() if matches_all(obj, attributes)
+                    if values[obj.id][pos] is not None and
+                    (after is None or (values[obj.id][pos], obj.id) > after))
+                return [obj for _, obj in found[:limit]]
+
+            result = []
+            for pos in range(start, len(ids) if limit > 0 else start):
+                obj = objs[ids[pos]]
+                if matches_all(obj, attributes):
+                    result.append(obj)
+                    if len(result) == limit:
+                        break
+            return result
@@ -8,6 +8,9 @@ class UserSession(Base):
     """ User Session class
     """
 
+    __slots__ = ('user_id', 'session_id')
+    _indexes = ('session_id', 'user_id')
+
     def __init__(self, *args: list, **kwargs: dict):
         """ Initialize a User instance
         """